@@ -0,0 +1,141 @@
+import json
+import random
+import string
+import time
+
+import json_codec
+from json_core import JsonAnalytics, JsonHandler, repair_text, tokenize
+
+
+def synthetic_chat(number_of_messages: int, participants=("Alice", "Bob"), seed=0) -> dict:
+    """Returns a repaired chatlog (the same format as JsonHandler.data) with the given number of messages.
+    The messages are ordered from the newest to the oldest, the same way Facebook stores them."""
+    rng = random.Random(seed)
+    words = ["hello", "how", "are", "you", "fine", "thanks", "tomorrow", "today", "ok", "lol"]
+    timestamp = 1400000000000  # 2014-05-13
+    messages = []
+    for _ in range(number_of_messages):
+        timestamp += rng.randint(1000, 3600 * 1000)
+        messages.append(JsonHandler.repair_message({"sender_name": rng.choice(participants),
+                                                    "timestamp_ms": timestamp,
+                                                    "content": " ".join(rng.choice(words) for _ in range(rng.randint(1, 10)))}))
+    messages.reverse()
+    return {"title": "Benchmark", "participants": [{"name": name} for name in participants], "messages": messages}
+
+
+def timed(function) -> float:
+    """Returns the number of seconds the function took."""
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def bench_dates(sizes=(25000, 50000, 100000, 200000)):
+    """Measures JsonAnalytics.dates() for growing chats. The time per message should stay roughly constant."""
+    print("JsonAnalytics.dates()")
+    for size in sizes:
+        analytics = JsonAnalytics(synthetic_chat(size))
+        seconds = timed(analytics.dates)
+        print(f"  {size:>8} messages: {seconds:8.3f} s  {seconds / size * 1e6:6.2f} us/message")
+
+
+def raw_messages(number_of_messages: int, seed=0) -> list:
+    """Returns messages as Facebook exports them, texts with diacritics are stored as UTF-8 bytes in latin-1 characters.
+    The messages have no timestamp, so only the repair of the texts is measured."""
+    rng = random.Random(seed)
+
+    def facebook(text):
+        return text.encode('utf-8').decode('latin-1')
+
+    participants = [facebook(name) for name in ("Jiří Novák", "Zuzana Dvořáková", "Bob")]
+    words = ["ahoj", "jak", "se", "máš", "dobře", "díky", "zítra", "ok", "hello", "lol"]
+    messages = []
+    for _ in range(number_of_messages):
+        messages.append({"sender_name": rng.choice(participants),
+                         "content": facebook(" ".join(rng.choice(words) for _ in range(rng.randint(1, 10)))),
+                         "reactions": [{"reaction": facebook("❤"), "actor": rng.choice(participants)}]})
+    return messages
+
+
+def repair_every_text(message):
+    """Reference repair which decodes every text of the message, the way JsonHandler did it before the caching."""
+    message["sender_name"] = message["sender_name"].encode('latin-1').decode('utf-8')
+    message["content"] = message["content"].encode('latin-1').decode('utf-8')
+    for reaction in message["reactions"]:
+        reaction["actor"] = reaction["actor"].encode('latin-1').decode('utf-8')
+        reaction["reaction"] = reaction["reaction"].encode('latin-1').decode('utf-8')
+
+
+def bench_repair(size=200000):
+    """Compares repairing every text with the cached repair of names and the lazy repair of the content."""
+    print("JsonHandler repair")
+    for label, repair in (("every text decoded", repair_every_text),
+                          ("JsonHandler.repair_message", JsonHandler.repair_message),
+                          ("repair_message_lazily", JsonHandler.repair_message_lazily),
+                          ("lazily + content in WordCounter", lambda message: repair_text(
+                              JsonHandler.repair_message_lazily(message)["content"]))):
+        messages = raw_messages(size)
+        seconds = timed(lambda: [repair(message) for message in messages])
+        print(f"  {label:<32}: {seconds:8.3f} s  {seconds / size * 1e6:6.2f} us/message")
+
+
+def split_every_word(text: str, n: int) -> list:
+    """Reference tokenizer which cleans every word separately, the way WordCounter did it before tokenize()."""
+    translator = str.maketrans('', '', string.punctuation)
+    words = []
+    for word in text.split():
+        word = word.translate(translator).lower()
+        if len(word) >= n and "http" not in word and "www" not in word:
+            words.append(word)
+    return words
+
+
+def bench_tokenize(size=200000, n=3):
+    """Measures the throughput of the tokenizers in words per second, one message at a time and a batch of 1000 messages."""
+    print("Tokenizer")
+    contents = [message["content"] for message in synthetic_chat(size)["messages"]]
+    batches = ["\n".join(contents[x:x + 1000]) for x in range(0, len(contents), 1000)]
+    number_of_words = sum(len(content.split()) for content in contents)
+    for label, tokenizer, texts in (("every word cleaned", split_every_word, contents),
+                                    ("tokenize(), one message", tokenize, contents),
+                                    ("tokenize(), 1000 messages", tokenize, batches)):
+        seconds = timed(lambda: [tokenizer(text, n) for text in texts])
+        print(f"  {label:<32}: {seconds:8.3f} s  {number_of_words / seconds / 1e6:6.2f} M words/s")
+
+
+def synthetic_part(number_of_messages: int, seed=0) -> bytes:
+    """Returns a message_N.json file as Facebook exports it: texts with diacritics are stored as UTF-8 bytes
+    in latin-1 characters, which are escaped, so the file is pure ASCII."""
+    messages = raw_messages(number_of_messages, seed)
+    timestamp = 1400000000000  # 2014-05-13
+    for message in reversed(messages):
+        timestamp += 60 * 1000
+        message["timestamp_ms"] = timestamp
+        message["is_geoblocked_for_viewer"] = False
+    participants = [{"name": name} for name in sorted({message["sender_name"] for message in messages})]
+    return json.dumps({"participants": participants, "messages": messages, "title": "Benchmark",
+                       "is_still_participant": True, "thread_path": "inbox/benchmark_1"}, indent=2).encode("ascii")
+
+
+def bench_json(size=100000, repeat=3):
+    """Compares the installed json backends (json_codec.py) on a synthetic message_N.json file and on the results
+    of its analysis. Every backend has to give the same objects."""
+    part = synthetic_part(size)
+    expected = json.loads(part)
+    print(f"JSON backends ({len(part) / 1e6:.1f} MB part, {size} messages)")
+    for name in json_codec.BACKENDS:
+        json_codec.use(name)
+        assert json_codec.loads(part) == expected, name
+        assert json.loads(json_codec.dumps(expected)) == expected, name
+        load_seconds = min(timed(lambda: json_codec.loads(part)) for _ in range(repeat))
+        dump_seconds = min(timed(lambda: json_codec.dumps(expected)) for _ in range(repeat))
+        print(f"  {name:<8} loads: {load_seconds:8.3f} s {len(part) / load_seconds / 1e6:7.1f} MB/s"
+              f"   dumps: {dump_seconds:8.3f} s {len(part) / dump_seconds / 1e6:7.1f} MB/s")
+    json_codec.use(next(iter(json_codec.BACKENDS)))
+
+
+if __name__ == "__main__":
+    bench_dates()
+    bench_repair()
+    bench_tokenize()
+    bench_json()
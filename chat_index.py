@@ -0,0 +1,73 @@
+import bisect
+from typing import NamedTuple
+
+
+class ChatEntry(NamedTuple):
+    """One chatlog in the ChatIndex."""
+    id: int  # position of the chatlog in the results (ResultStore.chats), or the order in which it was added
+    title: str
+    type: str  # "2ppl" or "grp"
+    total: int  # number of messages
+
+    def label(self) -> str:
+        """Returns the text shown in the list of chatlogs."""
+        return f"{self.title} - {self.total}"
+
+
+class ChatIndex:
+    """Index of the chatlogs: id -> ChatEntry, and the conversations and the groups sorted by the number of messages
+    from highest to lowest. The orderings are sorted once when the index is built, chatlogs added later are inserted
+    to their place, so nothing is parsed or sorted again when the list is shown.
+    Chatlogs are identified by their id, because the titles are not unique (e.g. many chats with "Facebook user")."""
+
+    TYPES = ("2ppl", "grp")
+
+    def __init__(self, records=()):
+        self.entries = {}  # id -> ChatEntry
+        self.orderings = {chat_type: [] for chat_type in self.TYPES}  # type -> sorted list of ChatEntry
+        self.keys = {}  # type -> negative numbers of messages of the ordering, sorted, for bisect
+
+        for id_, record in enumerate(records):
+            entry = ChatEntry(id_, record["title"], record["type"], record["total"])
+            self.entries[entry.id] = entry
+            self.orderings[self.kind(entry.type)].append(entry)
+
+        for chat_type, ordering in self.orderings.items():
+            ordering.sort(key=lambda entry: (entry.total, entry.title), reverse=True)
+            self.keys[chat_type] = [-entry.total for entry in ordering]
+
+    @staticmethod
+    def kind(chat_type) -> str:
+        """Returns the ordering of the chat type, every chat which is not a conversation of two people is a group."""
+        return "2ppl" if chat_type == "2ppl" else "grp"
+
+    def position(self, chat_type, total) -> tuple:
+        """Returns the ordering and the row where a chatlog with the number of messages would be inserted."""
+        kind = self.kind(chat_type)
+        return kind, bisect.bisect_right(self.keys[kind], -total)
+
+    def add(self, title, chat_type, total, id_=None) -> tuple:
+        """Adds a chatlog to the index, id_ = None gives it the next free id. Returns the ordering where it was inserted
+        and its row."""
+        if id_ is None:
+            id_ = len(self.entries)
+        entry = ChatEntry(id_, title, chat_type, total)
+        self.entries[id_] = entry
+        kind, row = self.position(chat_type, total)
+        self.keys[kind].insert(row, -total)
+        self.orderings[kind].insert(row, entry)
+        return kind, row
+
+    def ordering(self, chat_type) -> list:
+        """Returns the chatlogs of the type sorted by the number of messages from highest to lowest."""
+        return self.orderings[self.kind(chat_type)]
+
+    def get(self, id_):
+        """Returns the ChatEntry with the id, or None if there is no such chatlog."""
+        return self.entries.get(id_)
+
+    def __contains__(self, id_):
+        return id_ in self.entries
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,45 @@
+import bisect
+from datetime import date, datetime
+
+# A series of the number of messages per day is stored sparsely as [days, counts]: days are only the days with
+# at least one message, as the number of days since 1970-01-01 in ascending order, and counts are their numbers
+# of messages. All series of a chatlog share one axis [first day, last day]. The days without messages are created
+# only when a series is shown, and only for the shown range (densify()).
+
+EPOCH = date(1970, 1, 1).toordinal()
+
+
+def today() -> int:
+    """Returns today as the number of days since 1970-01-01."""
+    return datetime.now().toordinal() - EPOCH
+
+
+def sparse(day_counts: dict) -> list:
+    """Returns the series [days, counts] of a dictionary day -> number of messages."""
+    days = sorted(day_counts)
+    return [days, [day_counts[day] for day in days]]
+
+
+def merge(series_list, start, end) -> list:
+    """Returns the sum of the series. Days outside of start..end (including) are not counted."""
+    day_counts = {}
+    for days, counts in series_list:
+        for day, count in zip(days, counts):
+            if start <= day <= end:
+                day_counts[day] = day_counts.get(day, 0) + count
+    return sparse(day_counts)
+
+
+def densify(series, start, end) -> list:
+    """Returns the number of messages for every day from start to end (including), days without messages are 0.
+    Only the days of the series in this range are visited."""
+    days, counts = series
+    dense = [0] * (end - start + 1)
+    for index in range(bisect.bisect_left(days, start), bisect.bisect_right(days, end)):
+        dense[days[index] - start] = counts[index]
+    return dense
+
+
+def dates(start, end) -> list:
+    """Returns the dates ("Year-Month-Day") of the days from start to end (including)."""
+    return [date.fromordinal(day + EPOCH).isoformat() for day in range(start, end + 1)]
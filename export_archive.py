@@ -0,0 +1,92 @@
+import functools
+import os
+import zipfile
+
+# Chatlogs can be read straight from the .zip archives downloaded from Facebook, they do not have to be extracted.
+# A json file inside an archive has the address "path/to/archive.zip!/path/inside/the/archive/message_1.json",
+# a normal json file has its usual path. Only the central directory of an archive (the list of its files) is read
+# when the chatlogs are found, and a message_N.json file is decompressed only when it is read. Photos and videos
+# are never read. Large exports are split into several archives, the parts of one chatlog can be in different archives.
+
+SEPARATOR = "!/"
+FOLDERS = ("archived", "inbox", "e2ee_cutover")  # folders of the messages with the folders of the chatlogs
+
+
+def split(address) -> tuple:
+    """Returns (archive, member) of an address inside an archive, or (None, address) of a normal file."""
+    index = address.lower().find(".zip" + SEPARATOR)
+    if index < 0:
+        return None, address
+    return address[:index + 4], address[index + 4 + len(SEPARATOR):]
+
+
+def archives(path) -> list:
+    """Returns the archives of the export: the path itself if it is a .zip file, or the .zip files in the folder
+    if it does not contain the extracted data (your_activity folder). Otherwise returns an empty list."""
+    if os.path.isfile(path):
+        return [path] if zipfile.is_zipfile(path) else []
+    with os.scandir(path) as entries:
+        names = sorted(entry.name for entry in entries if not entry.is_dir() or "your_activity" in entry.name)
+    if any("your_activity" in name for name in names):
+        return []
+    return [path + "/" + name for name in names if name.lower().endswith(".zip")]
+
+
+_opened = []  # archives opened by _open_archive(), closed by close_archives()
+
+
+@functools.lru_cache(maxsize=32)
+def _open_archive(path, mtime, size) -> zipfile.ZipFile:
+    opened = zipfile.ZipFile(path)
+    _opened.append(opened)
+    return opened
+
+
+def archive(path) -> zipfile.ZipFile:
+    """Returns the opened archive. An archive is opened only once per process, so its central directory is read once.
+    A new archive at the same path is opened again. The workers of the analysis are spawned, so every worker opens
+    its own archives."""
+    stat = os.stat(path)
+    return _open_archive(path, stat.st_mtime_ns, stat.st_size)
+
+
+def close_archives():
+    """Function that closes all opened archives. On Windows, an open archive cannot be moved or deleted, so the archives
+    are closed at the end of every analysis (the viewer keeps running)."""
+    _open_archive.cache_clear()
+    while _opened:
+        _opened.pop().close()
+
+
+def chat_parts(path) -> list:
+    """Returns (folder of the chatlog, member) of every json file of the chatlogs in the archive. The folder starts
+    at the your_activity folder, so the parts of one chatlog in different archives have the same folder."""
+    parts = []
+    for member in archive(path).namelist():
+        names = member.split("/")
+        for index, name in enumerate(names[:-4]):
+            # .../your_activity.../messages/inbox/<chatlog>/message_N.json
+            if "your_activity" in name:
+                if (len(names) == index + 5 and "messages" in names[index + 1]
+                        and any(folder in names[index + 2] for folder in FOLDERS) and ".json" in names[-1]):
+                    parts.append(("/".join(names[index:-1]), member))
+                break
+    return parts
+
+
+def open_part(address):
+    """Returns the json file opened for reading in binary mode. A file inside an archive is decompressed while it is read."""
+    archive_path, member = split(address)
+    if archive_path is None:
+        return open(address, "rb")
+    return archive(archive_path).open(member)
+
+
+def stat(address) -> tuple:
+    """Returns (size, mtime) of the json file. A file inside an archive has its uncompressed size and the mtime of
+    the archive."""
+    archive_path, member = split(address)
+    if archive_path is None:
+        stat_ = os.stat(address)
+        return stat_.st_size, stat_.st_mtime_ns
+    return archive(archive_path).getinfo(member).file_size, os.stat(archive_path).st_mtime_ns
@@ -5,18 +5,139 @@
 # words used, and the moving average of the number of messages over a specified number of days.
 
 try:
-    import json
+    import time
+
+    STARTED = time.perf_counter()  # Start of the application, the startup phases are measured from here.
+
+    import collections
     import os
-    import subprocess
     import sys
+    import threading
     import mplcursors
+    from PyQt5.QtCore import QAbstractListModel, QFileSystemWatcher, QModelIndex, Qt, QThread, pyqtSignal
     from PyQt5.QtGui import QIcon
-    from PyQt5.QtWidgets import QApplication, QComboBox, QWidget, QHBoxLayout, QListWidget, QTextEdit, QPushButton, \
-        QVBoxLayout
+    from PyQt5.QtWidgets import QApplication, QComboBox, QWidget, QHBoxLayout, QListView, QTextEdit, QPushButton, \
+        QVBoxLayout, QFileDialog, QLabel, QLineEdit, QProgressBar
     from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
     from matplotlib.figure import Figure
 
-    from json_core import main as analyse
+    import day_series
+    from chat_index import ChatIndex
+    from json_core import AnalysisCancelled, main as analyse
+    from moving_average import moving_average
+    from result_store import GENERAL, MANIFEST, ResultStore
+    from settings import FILE as SETTINGS_FILE, Settings, SettingsError
+
+    # Chat types of the General tab in the third combo box -> key in general data["subsets"], None = the default General data.
+    GENERAL_SUBSETS = {"Conversations": None, "Groups": "grp", "All chats": "all"}
+
+
+    class StartupTimer:
+        """Measures the phases of the startup of the application (import, load, index, first paint).
+        The times are printed and appended to startup_times.csv, so the cold start can be compared between versions."""
+
+        PHASES = ("import", "load", "index", "first paint")
+
+        def __init__(self, started, file="startup_times.csv"):
+            self.started = started
+            self.file = file
+            self.marks = {}  # phase -> seconds from the start of the application
+
+        def mark(self, phase) -> bool:
+            """Records the end of the phase. Only the first end is recorded (e.g. not a reload of the data).
+            Returns True if the phase was recorded now."""
+            if phase in self.marks:
+                return False
+            self.marks[phase] = time.perf_counter() - self.started
+            return True
+
+        def durations(self) -> dict:
+            """Returns the duration of every recorded phase in seconds."""
+            durations = {}
+            previous = 0
+            for phase in self.PHASES:
+                if phase in self.marks:
+                    durations[phase] = self.marks[phase] - previous
+                    previous = self.marks[phase]
+            return durations
+
+        def report(self):
+            """Prints the durations of the phases and appends them to the csv file."""
+            durations = self.durations()
+            print("Startup: " + ", ".join(f"{phase} {seconds:.3f} s" for phase, seconds in durations.items())
+                  + f", total {max(self.marks.values()):.3f} s")
+            try:
+                new_file = not os.path.exists(self.file)
+                file = open(self.file, "a", encoding="utf-8")
+                if new_file:
+                    file.write("time," + ",".join(self.PHASES) + ",total\n")
+                file.write(time.strftime("%Y-%m-%d %H:%M:%S") + ","
+                           + ",".join(f"{durations[phase]:.4f}" if phase in durations else "" for phase in self.PHASES)
+                           + f",{max(self.marks.values()):.4f}\n")
+                file.close()
+            except OSError as e:
+                print(f"Error writing {self.file}: {e}")
+
+
+    startup = StartupTimer(STARTED)
+    startup.mark("import")
+
+
+    def day_graph(series, axis, n):
+        """Returns [dates, counts] of the sparse series of days for every day of the axis, and its moving average of n days.
+        The days without messages are created only here, when the series is shown."""
+        dates_ = day_series.dates(*axis)
+        counts = day_series.densify(series, *axis)
+        return [dates_, counts], moving_average(dates_, counts, n)
+
+
+    class LazyChats:
+        """Dictionary-like access to the results of the chatlogs (id of the chatlog -> JsonAnalytics.stored_data value).
+        A chatlog is read from the ResultStore only when it is needed for the first time and the last cache_size
+        chatlogs are kept in memory (least recently used are removed)."""
+
+        def __init__(self, store, index, cache_size=32):
+            self.store = store
+            self.index = index  # ChatIndex of the chatlogs in the store
+            self.cache_size = max(1, cache_size)
+            self.cache = collections.OrderedDict()  # id -> results of the chatlog, the most recently used at the end
+            self.general = store.general()  # The general data are small, they are loaded at once.
+
+        def __getitem__(self, chat_id):
+            if chat_id == GENERAL:
+                if self.general is None:
+                    raise KeyError(GENERAL)  # The general data were not stored.
+                return self.general
+            try:
+                self.cache.move_to_end(chat_id)
+                return self.cache[chat_id]
+            except KeyError:
+                pass
+
+            if chat_id not in self.index:
+                raise KeyError(chat_id)
+            value = next(iter(self.store.chat(chat_id).values()))
+            self.cache[chat_id] = value
+            self.trim()
+            return value
+
+        def resize(self, cache_size):
+            """Sets how many chatlogs are kept in memory, the least recently used are removed at once."""
+            self.cache_size = max(1, cache_size)
+            self.trim()
+
+        def trim(self):
+            """Removes the least recently used chatlogs over cache_size."""
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        def __contains__(self, chat_id):
+            if chat_id == GENERAL:
+                return self.general is not None
+            return chat_id in self.index
+
+        def keys(self):
+            return list(self.index.entries.keys()) + ([GENERAL] if self.general is not None else [])
 
 
     class Data:
@@ -25,69 +146,177 @@ try:
 
             try:
                 # Your code here
-                file = open("Datas_j/data.json", "r", encoding="utf-8")
-                self.data = json.load(file)  # If the file exists, load the data from it.
-                file.close()
+                self.store = ResultStore()  # Opens Datas_j/manifest.json and Datas_j/series.bin.
             except FileNotFoundError:
                 print("File not found. Running json_handler2.py...")
-                self.data = analyse()  # Run the main function from json_core.py -> will create the data.json file
-
-            self.data_participants = {}
-            self.participants = []
-            self.convs = {}
-            self.group_names = []
-            self.groups = {}
-            self.conv_names = []
-
-        def show_info(self):
-            for x in self.data:
-                for key, value in x.items():
-                    self.data_participants[key] = value
-                    self.participants.append(key)
-
-        def filler(self):
-            """Function to fill the conversations and groups dictionaries."""
-            for name in self.participants[:-1]:
-                # exclude the last one, which is directory with general information
-                if self.data_participants[name][0] == "2ppl":
-                    self.convs[name] = self.data_participants[name]
-                    self.conv_names.append(name + " - " + str(self.data_participants[name][2]))
-                else:
-                    self.groups[name] = self.data_participants[name]
-                    self.group_names.append(name + " - " + str(self.data_participants[name][2]))
+                analyse()  # Run the main function from json_core.py -> will create the results in Datas_j
+                self.store = ResultStore()
+
+            self.index = None  # ChatIndex, built by build_index()
+            self.data_participants = None
+
+        def build_index(self):
+            """Function to build the index of the chatlogs (title -> id, type, number of messages, sorted conversations
+            and groups). Only the records of the results are needed, the chatlogs themselves are not loaded."""
+            self.index = ChatIndex(self.store.chats)
+            # Chatlogs are loaded when they are displayed, chat_cache_size in setting.txt sets how many stay in memory.
+            self.data_participants = LazyChats(self.store, self.index)
+
+        def apply_settings(self, settings):
+            """Function to apply the settings of the viewer."""
+            self.data_participants.resize(settings.chat_cache_size)
+
+        def close(self):
+            """Function to release the files with the results, so a new analysis can replace them."""
+            self.store.close()
+
+
+    class LiveData:
+        """Results of a running analysis. The chatlogs are added one by one as they are analysed, so they can be shown
+        before the whole analysis is finished. It has the attributes of Data which the viewer uses."""
+
+        def __init__(self):
+            self.data_participants = {}  # id of the chatlog -> its results
+            self.index = ChatIndex()
+
+        def add(self, stored_data):
+            """Adds the results of one chatlog (JsonAnalytics.stored_data), the chatlogs get ids in the order they are
+            added. Returns the ordering of the index where the chatlog was inserted and its row."""
+            title, value = next(iter(stored_data.items()))
+            chat_id = len(self.data_participants)
+            self.data_participants[chat_id] = value
+            return self.index.add(title, value[0], value[2], chat_id)
 
-        def sorter(self):
-            """Function to sort the conversations and groups by the number of messages."""
+        def apply_settings(self, settings):
+            """The results of a running analysis do not depend on the settings of the viewer."""
 
-            # Sort list of conversations by number of messages from highest to lowest
-            counts = []
-            for x in self.conv_names:
-                counts.append(int(x.split(" - ")[1]))
-            self.conv_names = [x for _, x in sorted(zip(counts, self.conv_names), reverse=True)]
+        def close(self):
+            """The results are in memory, there are no files to release."""
 
-            # Sort list of groups by number of messages from highest to lowest
-            counts = []
-            for x in self.group_names:
-                counts.append(int(x.split(" - ")[1]))
-            self.group_names = [x for _, x in sorted(zip(counts, self.group_names), reverse=True)]
 
+    class AnalysisThread(QThread):
+        """Runs the analysis (main function from json_core.py) in the background, so the window does not freeze.
+        chat_done is emitted after every chatlog, analysis_finished at the end with an empty message
+        or with the reason why the analysis did not finish."""
+
+        chat_done = pyqtSignal(int, int, str, object)  # finished chatlogs, all chatlogs, title, results of the chatlog
+        analysis_finished = pyqtSignal(str)
+
+        def __init__(self, path, workers=1):
+            super().__init__()
+            self.path = path
+            self.workers = workers
+            self.cancel_event = threading.Event()
+
+        def run(self):
+            try:
+                analyse(self.workers, self.path, progress=self.progress, cancel=self.cancel_event)
+                self.analysis_finished.emit("")
+            except AnalysisCancelled as e:
+                self.analysis_finished.emit(str(e))
+            except Exception as e:
+                self.analysis_finished.emit(f"The analysis failed: {e}")
+
+        def progress(self, done, total, stored_data):
+            """Called by the analysis in this thread, the signal passes the results to the window."""
+            self.chat_done.emit(done, total, next(iter(stored_data)), stored_data)
+
+        def cancel(self):
+            """The analysis stops after the current chatlog."""
+            self.cancel_event.set()
+
+
+    def load_data() -> Data:
+        """Function that loads the results of the analysis and prepares the sorted lists of chatlogs.
+        It is the only place where Data is created, the viewer calls it at startup and after a new analysis."""
+        data = Data()  # Initialize data.
+        startup.mark("load")
+        data.build_index()  # Index and sort the chatlogs.
+        startup.mark("index")
+        return data
+
+
+    class ChatListModel(QAbstractListModel):
+        """Qt model of the list of chatlogs. It shows an ordering of the ChatIndex, so the list view does not need
+        copies of the texts and a list with tens of thousands of chatlogs is filled at once.
+        The filter keeps only the chatlogs whose title contains the given text."""
+
+        def __init__(self):
+            super().__init__()
+            self.entries = []  # Shown ordering of the ChatIndex (list of ChatEntry)
+            self.filter_text = ""
+            self.rows = None  # Rows of the entries which pass the filter, None = all entries
+
+        def rowCount(self, parent=QModelIndex()):
+            if parent.isValid():
+                return 0
+            return len(self.entries) if self.rows is None else len(self.rows)
+
+        def data(self, index, role=Qt.DisplayRole):
+            entry = self.entry(index.row()) if index.isValid() else None
+            if entry is None:
+                return None
+            if role == Qt.DisplayRole:
+                return entry.label()
+            if role == Qt.UserRole:
+                return entry.id
+            return None
+
+        def entry(self, row):
+            """Returns the ChatEntry in the row of the list, or None."""
+            if row < 0 or row >= self.rowCount():
+                return None
+            return self.entries[row if self.rows is None else self.rows[row]]
+
+        def filtered_rows(self):
+            """Returns the rows of the entries which contain the filter text, or None if there is no filter."""
+            if not self.filter_text:
+                return None
+            return [row for row, entry in enumerate(self.entries) if self.filter_text in entry.title.casefold()]
+
+        def set_entries(self, entries):
+            """Shows the ordering of the ChatIndex."""
+            self.beginResetModel()
+            self.entries = entries
+            self.rows = self.filtered_rows()
+            self.endResetModel()
+
+        def set_filter(self, text):
+            """Shows only the chatlogs whose title contains the text (case insensitive)."""
+            self.beginResetModel()
+            self.filter_text = text.casefold()
+            self.rows = self.filtered_rows()
+            self.endResetModel()
+
+        def insert_entry(self, row, add):
+            """Calls add(), which inserts an entry to the shown ordering at the row, and shows the new entry."""
+            if self.rows is not None:
+                add()
+                self.set_entries(self.entries)  # The filter is applied again.
+                return
+            self.beginInsertRows(QModelIndex(), row, row)
+            add()
+            self.endInsertRows()
 
-    data = Data()
-    data.show_info()
-    data.filler()
-    data.sorter()
 
     class JsonViewer(QWidget):
         def __init__(self):
             super().__init__()  # Call the parent class constructor.
 
-            self.data = Data()  # Initialize data.
-            self.data.show_info()  # Show the data.
-            self.data.filler()  # Fill the data.
-            self.data.sorter()  # Sort the data.
-            self.groups = self.data.group_names  # Get the group names.
-            self.conversations = self.data.conv_names  # Get the conversation names.
-            self.selected_chat = ""
+            self.data = load_data()  # Load and index the data.
+            # The settings are read after the data, the first analysis creates setting.txt.
+            self.settings = Settings.load()
+            self.data.apply_settings(self.settings)
+            # setting.txt is watched, a new moving average is shown without a new analysis. The folder is watched too,
+            # because some editors replace the file and the file does not exist before the first analysis.
+            self.settings_watcher = QFileSystemWatcher([os.path.abspath(".")])
+            if os.path.exists(SETTINGS_FILE):
+                self.settings_watcher.addPath(os.path.abspath(SETTINGS_FILE))
+            self.settings_watcher.fileChanged.connect(self.settings_changed)
+            self.settings_watcher.directoryChanged.connect(self.settings_changed)
+            self.selected_chat = None  # id of the chatlog shown in the text
+            self.analysis = None  # Running AnalysisThread
+            self.analysis_started = 0
 
             self.setWindowIcon(QIcon('addons/mess_icon.ico'))  # Set the window icon.
             self.setWindowTitle('Messenger Analytics')  # Set the window name.
@@ -101,6 +330,12 @@ try:
 
             self.load_list()  # Call the load_list method.
 
+        def paintEvent(self, event):
+            """Paint event handler. The first paint ends the startup of the application."""
+            super().paintEvent(event)
+            if startup.mark("first paint"):
+                startup.report()
+
         def init_ui(self):
             """Initialize the user interface."""
 
@@ -135,21 +370,39 @@ try:
                 self.update_graphs)  # Connect the currentIndexChanged signal to the update_graphs method.
             h_layout_top.addWidget(self.comboBox2)  # Add the combo box to the horizontal layout
 
+            # Combo Box 3, chat types of the General tab
+            self.comboBox3 = QComboBox()
+            self.comboBox3.addItems(list(GENERAL_SUBSETS.keys()))
+            self.comboBox3.setVisible(False)  # Visible only in the General tab
+            self.comboBox3.currentIndexChanged.connect(
+                self.load_list)  # Connect the currentIndexChanged signal to the load_list method.
+            h_layout_top.addWidget(self.comboBox3)  # Add the combo box to the horizontal layout
+
             # Add the horizontal layout to the main layout
             layout.addLayout(h_layout_top)
 
             # Horizontal layout for the list widget and the text edit
             h_layout = QHBoxLayout()
 
-            # Left column with scrollbar
-            self.file_list_widget = QListWidget()
+            # Left column with the filter and the list of chatlogs with scrollbar
+            v_layout_left = QVBoxLayout()
+            self.filter_edit = QLineEdit()
+            self.filter_edit.setPlaceholderText("Filter chats")
+            self.filter_edit.textChanged.connect(self.filter_list)  # Connect the textChanged signal to the filter_list method
+            v_layout_left.addWidget(self.filter_edit)
+            self.chat_model = ChatListModel()  # Model with the chatlogs of the ChatIndex
+            self.file_list_widget = QListView()
+            self.file_list_widget.setModel(self.chat_model)
+            self.file_list_widget.setUniformItemSizes(True)  # All rows have the same height, long lists are faster.
             # Set the visibility based on the initial selection
             self.file_list_widget.setVisible(self.comboBox1.currentText() != "General")
-            self.file_list_widget.itemSelectionChanged.connect(
-                self.update_info_text_edit)  # Connect the itemSelectionChanged signal to the update_info_text_edit method
-            h_layout.addWidget(self.file_list_widget)  # Add the list widget to the horizontal layout
-            self.file_list_widget.itemSelectionChanged.connect(
-                self.update_comboboxes)  # Connect the itemSelectionChanged signal to the update_comboboxes method
+            self.filter_edit.setVisible(self.comboBox1.currentText() != "General")
+            self.file_list_widget.selectionModel().selectionChanged.connect(
+                self.update_info_text_edit)  # Connect the selectionChanged signal to the update_info_text_edit method
+            v_layout_left.addWidget(self.file_list_widget)  # Add the list view to the left column
+            h_layout.addLayout(v_layout_left)  # Add the left column to the horizontal layout
+            self.file_list_widget.selectionModel().selectionChanged.connect(
+                self.update_comboboxes)  # Connect the selectionChanged signal to the update_comboboxes method
 
             # Right space for displaying info
             self.info_text_edit = QTextEdit()
@@ -187,24 +440,54 @@ try:
             # Horizontal layout for the combo boxes at the bottom
             h_layout_bottom = QHBoxLayout()
 
+            # Progress of the analysis, visible only while the analysis is running
+            self.progress_label = QLabel()
+            self.progress_label.setVisible(False)
+            h_layout_bottom.addWidget(self.progress_label)
+            self.progress_bar = QProgressBar()
+            self.progress_bar.setVisible(False)
+            h_layout_bottom.addWidget(self.progress_bar)
+            self.cancel_button = QPushButton("Cancel")
+            self.cancel_button.setVisible(False)
+            self.cancel_button.clicked.connect(self.cancel_analysis)  # Connect the clicked signal to the cancel_analysis method
+            h_layout_bottom.addWidget(self.cancel_button)
+
             # Add the bottom layout to the main layout
             layout.addLayout(h_layout_bottom)
 
             # Set the main layout
             self.setLayout(layout)
 
+        def current_id(self):
+            """Returns the id of the chatlog selected in the list, or None. The data of the chatlogs are looked up
+            by the id, titles are not unique."""
+            entry = self.chat_model.entry(self.file_list_widget.currentIndex().row())
+            return None if entry is None else entry.id
+
+        def select_first_chat(self):
+            """Selects the first chatlog in the list."""
+            self.file_list_widget.setCurrentIndex(self.chat_model.index(0))
+
+        def filter_list(self, text):
+            """Shows only the chatlogs whose title contains the text from the filter."""
+            self.chat_model.set_filter(text)
+            self.select_first_chat()
+
         def update_top_words(self):
             """Update the top words based on the current item in the list widget and the combo box."""
-            self.current_item = self.file_list_widget.currentItem().text().split(" - ")[0]
+            self.current_item = self.current_id()
             current_item_2 = self.comboBox2.currentText()
             data_ = self.data.data_participants[self.current_item]
             result = f"""<p><b>Most common words - {current_item_2}:</b><br> {"<br>".join(f'{key}: {value}' for key, value in data_[7][current_item_2])}</p>"""
+            # Approximate counting of words (top_words_capacity in setting.txt) can overestimate the counts.
+            if len(data_) > 8 and data_[8].get(current_item_2, 0) > 0:
+                result += f"""<p><i>Approximate counts, each can be overestimated by at most {data_[8][current_item_2]}.</i></p>"""
             self.top_words_bar.setText(result)
 
         def update_graphs(self):
             try:
                 # Get the current item in the list widget
-                self.current_item = self.file_list_widget.currentItem().text().split(" - ")[0]
+                self.current_item = self.current_id()
 
                 current_item_1 = current_item_2 = current_item_3 = self.comboBox2.currentText()
 
@@ -214,22 +497,22 @@ try:
 
                     self.update_top_words()
 
+                    moving_avarage = self.settings.moving_average  # Window of the moving average
+                    # Every day of the axis of the chatlog [6] and the moving average, created from the sparse series.
+                    days, ma_values = day_graph(self.data.data_participants[self.current_item][5][current_item_1],
+                                                self.data.data_participants[self.current_item][6], moving_avarage)
+
                     # Update the graphs based on the item text
                     self.plot1.clear()
-                    self.plot1.plot(self.data.data_participants[self.current_item][5][current_item_1][0],
-                                    self.data.data_participants[self.current_item][5][current_item_1][1],
+                    self.plot1.plot(days[0],
+                                    days[1],
                                     c="forestgreen",
                                     linewidth=0.4)  # Replace with your actual data
-                    # Load the setting file
-                    setting = open("setting.txt", "r")
-                    setting_data = setting.read().splitlines()
-                    moving_avarage = int(setting_data[0].split(":")[1])
-                    setting.close()
 
                     # If the moving average is less than the length of the data, plot the moving average, otherwise there would not be enough data points to plot it.
-                    if moving_avarage <= (len(self.data.data_participants[self.current_item][6][current_item_1][1])):
-                        self.plot1.plot(self.data.data_participants[self.current_item][6][current_item_1][0],
-                                        self.data.data_participants[self.current_item][6][current_item_1][1],
+                    if moving_avarage <= (len(ma_values[1])):
+                        self.plot1.plot(ma_values[0],
+                                        ma_values[1],
                                         c="red",
                                         linewidth=0.8)  # Replace with your actual data
 
@@ -237,12 +520,8 @@ try:
                     # Grid
                     self.plot1.grid(True)
 
-                    # self.plot1.set_xticks(self.data.data_participants[self.current_item][5][current_item_1][0][::(len(self.data.data_participants[self.current_item][5][current_item_1][0])) // 2])
-                    xticks_indices = [0] + [
-                        int(len(self.data.data_participants[self.current_item][5][current_item_1][0]) * n) for n in
-                        [1 / 4, 2 / 4, 3 / 4]] + [len(self.data.data_participants[self.current_item][5][current_item_1][0]) - 1]
-                    xticks_labels = [self.data.data_participants[self.current_item][5][current_item_1][0][i] for i in
-                                     xticks_indices]
+                    xticks_indices = [0] + [int(len(days[0]) * n) for n in [1 / 4, 2 / 4, 3 / 4]] + [len(days[0]) - 1]
+                    xticks_labels = [days[0][i] for i in xticks_indices]
                     self.plot1.set_xticks(xticks_indices, xticks_labels)
                     self.canvas1.draw()
 
@@ -270,38 +549,33 @@ try:
         def update_comboboxes(self):
             try:
                 # Get the current item in the list widget.
-                current_item = self.file_list_widget.currentItem()
-                if current_item:
-                    item_text = current_item.text()
-
-                    # Update the combo boxes based on the item text
-                    # This is just an example, replace it with your actual logic
-
+                current_item = self.current_id()
+                if current_item is not None:
+                    # Update the combo boxes based on the selected chatlog
                     self.comboBox2.clear()
-                    self.comboBox2.addItems(list(self.data.data_participants[item_text.split(" - ")[0]][4].keys()))
+                    self.comboBox2.addItems(list(self.data.data_participants[current_item][4].keys()))
             except:
                 pass
 
         def update_info_text_edit(self):
             """Update the QTextEdit with the data associated with the current item in the list widget."""
-            current_item = self.file_list_widget.currentItem()
-            if current_item:
-                item_text = current_item.text()  # Item text is the name of the file
+            current_item = self.current_id()
+            if current_item is not None:
                 # Get the data associated with the item
-                self.selected_chat = item_text.split(" - ")[0]
-                item_data = self.get_item_data(item_text)
+                self.selected_chat = current_item
+                item_data = self.get_item_data(current_item)
                 # Update the QTextEdit with the item data
                 self.info_text_edit.setText(item_data)
 
-        def get_item_data(self, item_text):
+        def get_item_data(self, chat_id):
             """Information about the selected chat."""
             try:
-                # Replace this with the actual code that retrieves the data
-                self.selected_chat = item_text.split(" - ")[0]
-                data_ = self.data.data_participants[item_text.split(" - ")[0]]
+                self.selected_chat = chat_id
+                title = self.data.index.entries[chat_id].title
+                data_ = self.data.data_participants[chat_id]
 
                 return f"""
-                            <h2>Chat name: {item_text.split(" - ")[0]}</h2>
+                            <h2>Chat name: {title}</h2>
                             <p><b>Number of participants:</b> {len(data_[1])} = {", ".join(data_[1])}</p>
                             <p><b>Number of messages:</b> {data_[2]}</p>
         <p><b>Number of messages from each participant:</b><br> {"<br>".join(f'{key}: {value}' for key, value in data_[3].items())}</p>
@@ -310,58 +584,139 @@ try:
                 pass
 
         def button_clicked(self):
-            """Button click event handler. Runs the json_core.py script and reloads the data."""
-            self.delete_files()
-            subprocess.call("python json_core.py", shell=False)
-            self.reload_data()
-
-        def delete_files(self):
-            """Delete all files in the Datas_j folder."""
-            folder_path = 'Datas_j'
-
-            # Get the list of files in the folder
-            files = os.listdir(folder_path)
-
-            # Iterate through the files and delete each one
-            for file in files:
-                file_path = os.path.join(folder_path, file)
-                try:
-                    if os.path.isfile(file_path):
-                        os.remove(file_path)
-                except Exception as e:
-                    print(f"Error deleting {file_path}: {e}")
+            """Button click event handler. Starts a new analysis in the background, the finished chatlogs are shown
+            in the list while the analysis is running."""
+            if self.analysis is not None:
+                return
+            folder = QFileDialog.getExistingDirectory(self, "Select Folder")
+            if not folder:
+                return  # No folder was selected, the current results stay.
+
+            # The results of the previous analysis are released, so the analysis can replace them.
+            self.data.close()
+            self.data = LiveData()
+            self.load_list()
+
+            self.button.setEnabled(False)
+            self.progress_bar.setValue(0)
+            self.progress_label.setText("Looking for chatlogs...")
+            for widget in (self.progress_label, self.progress_bar, self.cancel_button):
+                widget.setVisible(True)
+            self.cancel_button.setEnabled(True)
+
+            self.analysis = AnalysisThread(folder, self.settings.workers)
+            self.analysis.chat_done.connect(self.chat_analysed)
+            self.analysis.analysis_finished.connect(self.analysis_finished)
+            self.analysis_started = time.perf_counter()
+            self.analysis.start()
+
+        def chat_analysed(self, done, total, title, stored_data):
+            """Shows the progress of the analysis and adds the finished chatlog to the list."""
+            value = stored_data[title]
+            kind, row = self.data.index.position(value[0], value[2])
+            if self.chat_model.entries is self.data.index.orderings[kind]:
+                # The chatlog belongs to the shown list.
+                self.chat_model.insert_entry(row, lambda: self.data.add(stored_data))
+                if not self.file_list_widget.currentIndex().isValid():
+                    self.select_first_chat()
+            else:
+                self.data.add(stored_data)
+
+            # The remaining time is estimated from the average time of the finished chatlogs.
+            remaining = int((time.perf_counter() - self.analysis_started) / done * (total - done))
+            self.progress_bar.setMaximum(total)
+            self.progress_bar.setValue(done)
+            self.progress_label.setText(f"{title} ({done}/{total}), remaining about {remaining // 60}:{remaining % 60:02d}")
+
+        def cancel_analysis(self):
+            """Cancel button click event handler. The analysis stops after the current chatlog."""
+            if self.analysis is not None:
+                self.analysis.cancel()
+                self.cancel_button.setEnabled(False)
+                self.progress_label.setText("Cancelling...")
+
+        def analysis_finished(self, message):
+            """Called when the analysis ends. Loads the new results, or the previous ones if the analysis did not finish."""
+            self.analysis.wait()
+            self.analysis = None
+            self.button.setEnabled(True)
+            self.progress_bar.setVisible(False)
+            self.cancel_button.setVisible(False)
+            self.progress_label.setText(message)
+            self.progress_label.setVisible(bool(message))
+            if message:
+                print(message)
+
+            if os.path.exists(os.path.join("Datas_j", MANIFEST)):
+                self.reload_data()
+            # Without any stored results, the chatlogs analysed before the cancel stay shown.
+
+        def closeEvent(self, event):
+            """Window close event handler. A running analysis is cancelled before the window is closed."""
+            if self.analysis is not None:
+                self.analysis.cancel()
+                self.analysis.wait()
+            super().closeEvent(event)
 
         def reload_data(self):
-            """Reload the data from the data.json file."""
-            self.data = Data()
-            self.data.show_info()
-            self.data.filler()
-            self.data.sorter()
-            self.groups = self.data.group_names
-            self.conversations = self.data.conv_names
+            """Reload the data from the Datas_j folder."""
+            self.data.close()
+            self.data = load_data()
+            self.data.apply_settings(self.settings)
             self.load_list()
 
+        def settings_changed(self):
+            """Reads setting.txt again when it changed. A new moving average window is shown at once, the moving averages
+            are calculated when the graphs are drawn. The other settings of the analysis are used by the next analysis."""
+            path = os.path.abspath(SETTINGS_FILE)
+            if os.path.exists(path) and path not in self.settings_watcher.files():
+                self.settings_watcher.addPath(path)  # The file was created or replaced.
+            try:
+                settings = self.settings.reload()
+            except SettingsError as e:
+                print(e)  # The previous settings stay.
+                return
+            if settings is None:
+                return  # setting.txt did not change.
+
+            moving_average_changed = settings.moving_average != self.settings.moving_average
+            self.settings = settings
+            self.data.apply_settings(settings)
+            if moving_average_changed:
+                if self.comboBox1.currentText() == "General":
+                    if GENERAL in self.data.data_participants:
+                        self.update_graphs_general()
+                else:
+                    self.update_graphs()
+
         def load_list(self):
             """Load the list widget based on the current selection in the combo box."""
             current_option = self.comboBox1.currentText()
             # Remember the currently selected items in the combo boxes
             current_item_2 = self.comboBox2.currentText()
-            self.file_list_widget.clear()  # Clear the list widget
+            self.chat_model.set_entries([])  # Clear the list widget
             self.info_text_edit.clear()  # Clear the text edit widget
 
             if current_option == "General":
                 self.file_list_widget.setVisible(False)  # Hide the list widget
+                self.filter_edit.setVisible(False)  # Hide the filter
                 self.comboBox2.setVisible(False)  # Hide the second combo box
+                self.comboBox3.setVisible(True)  # Show the combo box with chat types
                 self.top_words_bar.setVisible(False)  # Hide the second combo box
 
+                if GENERAL not in self.data.data_participants:
+                    # The general data are calculated at the end of the analysis.
+                    self.info_text_edit.setText("<h2>General Data</h2><p>The general data will be shown when the analysis is finished.</p>")
+                    return
+
                 # Display general data if the "General" option is selected.
-                general_data = self.data.data_participants["*-General-*"]
+                general_data = self.general_data()
 
                 general_dispay = f"""
-                                    <h2>General Data</h2>
-                                    <p><b>Number of sent messages:</b> {self.data.data_participants["*-General-*"]["sent"]}</p>
-                                    <p><b>Number of received messages:</b> {self.data.data_participants["*-General-*"]["received"]}</p>
-                                    <p><b>Number of all messages:</b> {self.data.data_participants["*-General-*"]["received"] + self.data.data_participants["*-General-*"]["sent"]}</p>
+                                    <h2>General Data - {self.comboBox3.currentText()}</h2>
+                                    <p><b>Number of sent messages:</b> {general_data["sent"]}</p>
+                                    <p><b>Number of received messages:</b> {general_data["received"]}</p>
+                                    <p><b>Number of all messages:</b> {general_data["received"] + general_data["sent"]}</p>
                                     """
 
                 self.info_text_edit.setText(
@@ -370,7 +725,9 @@ try:
             else:
                 # If the "Conversations" or "Groups" option is selected.
                 self.file_list_widget.setVisible(True)  # Show the list widget
+                self.filter_edit.setVisible(True)  # Show the filter
                 self.comboBox2.setVisible(True)  # Hide the second combo box
+                self.comboBox3.setVisible(False)  # Hide the combo box with chat types
                 self.top_words_bar.setVisible(True)  # the second combo box
 
                 for i in range(self.chart_layout1.count()):  # Show all widgets in chart_layout1
@@ -387,7 +744,7 @@ try:
 
                 # Select the first item in the list widget
 
-                self.file_list_widget.setCurrentRow(0)
+                self.select_first_chat()
 
             # Restore the selected items in the combo boxes
             index2 = self.comboBox2.findText(current_item_2)
@@ -396,14 +753,24 @@ try:
 
         def load_conversations(self):
             """Function to load the conversations into the list widget."""
-            self.file_list_widget.clear()
-            _conversations = self.conversations
-            self.file_list_widget.addItems(_conversations)
+            self.chat_model.set_entries(self.data.index.ordering("2ppl"))
+
+        def general_data(self):
+            """Returns the general data of the chat types selected in the third combo box."""
+            general_data = self.data.data_participants[GENERAL]
+            subset = GENERAL_SUBSETS[self.comboBox3.currentText()]
+            # Results of older analyses do not have the data of groups.
+            if subset is None or subset not in general_data.get("subsets", {}):
+                return general_data
+            return general_data["subsets"][subset]
 
         def update_graphs_general(self):
             """Function to update the graphs with general data."""
-            data_1 = self.data.data_participants["*-General-*"]["dates"]
-            data_2 = list(self.data.data_participants["*-General-*"]["hours"].values())
+            general_data = self.general_data()
+            moving_avarage = self.settings.moving_average  # Window of the moving average
+            # Every day of the axis and the moving average, created from the sparse series.
+            data_1, ma_values = day_graph(general_data["dates"], general_data["axis"], moving_avarage)
+            data_2 = list(general_data["hours"].values())
 
             self.plot1.clear()  # Clear the plot
             self.plot1.plot(data_1[0], data_1[1], c="forestgreen",
@@ -414,16 +781,10 @@ try:
             xticks_labels = [data_1[0][i] for i in xticks_indices]
             self.plot1.set_xticks(xticks_indices, xticks_labels)
 
-            # Load the setting file
-            setting = open("setting.txt", "r")
-            setting_data = setting.read().splitlines()
-            moving_avarage = int(setting_data[0].split(":")[1])
-            setting.close()
-
             # If the moving average is less than the length of the data, plot the moving average, otherwise there would not be enough data points to plot it.
-            if moving_avarage <= (len(self.data.data_participants["*-General-*"]["moving_average"][1])):
-                self.plot1.plot(self.data.data_participants["*-General-*"]["moving_average"][0],
-                                self.data.data_participants["*-General-*"]["moving_average"][1],
+            if moving_avarage <= (len(ma_values[1])):
+                self.plot1.plot(ma_values[0],
+                                ma_values[1],
                                 c="red",
                                 linewidth=0.8)  # Replace with your actual data
             self.plot1.grid(True)
@@ -442,13 +803,11 @@ try:
 
         def load_groups(self):
             """Function to load the groups into the list widget."""
-            self.file_list_widget.clear()
-            _groups = self.groups
-            self.file_list_widget.addItems(_groups)
+            self.chat_model.set_entries(self.data.index.ordering("grp"))
 
         def print_data(self):
             """Print the data."""
-            print(self.data.data_participants.keys())
+            print([entry.title for entry in self.data.index.entries.values()])
 
 
     if __name__ == '__main__':
@@ -0,0 +1,70 @@
+class SpaceSaving:
+    """Approximate counter of the most frequent items (Space-Saving algorithm by Metwally, Agrawal and El Abbadi).
+    At most capacity items are monitored, so the memory does not grow with the number of different items.
+    When a new item comes and the counter is full, the item with the lowest count is replaced and the new item
+    inherits its count. The counts can therefore be overestimated, but never by more than max_error(),
+    and every item which occurs more than total / capacity times is always monitored.
+    Every operation costs constant time, items with the same count are kept together in buckets."""
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("The capacity must be at least 1.")
+        self.capacity = capacity
+        self.counts = {}  # item -> count
+        self.errors = {}  # item -> how much the count of the item can be overestimated
+        self.buckets = {}  # count -> items with this count (dictionary used as an ordered set)
+        self.min_count = 0  # the lowest count of a monitored item
+        self.total = 0  # number of all added items
+
+    def add(self, item):
+        """Counts one occurrence of the item."""
+        self.total += 1
+        count = self.counts.get(item)
+
+        if count is not None:
+            # The item is monitored, it moves to the bucket with count + 1.
+            self._move(item, count)
+
+        elif len(self.counts) < self.capacity:
+            # There is still space for a new item.
+            self.counts[item] = 1
+            self.errors[item] = 0
+            self.buckets.setdefault(1, {})[item] = None
+            self.min_count = 1
+
+        else:
+            # The oldest item with the lowest count is replaced by the new item.
+            victim = next(iter(self.buckets[self.min_count]))
+            del self.counts[victim]
+            del self.errors[victim]
+            self.buckets[self.min_count][item] = None
+            del self.buckets[self.min_count][victim]
+            self.counts[item] = self.min_count
+            self.errors[item] = self.min_count
+            self._move(item, self.min_count)
+
+    def _move(self, item, count):
+        """Moves the item from the bucket with count to the bucket with count + 1."""
+        bucket = self.buckets[count]
+        del bucket[item]
+        if not bucket:
+            del self.buckets[count]
+            if count == self.min_count:
+                self.min_count = count + 1
+        self.buckets.setdefault(count + 1, {})[item] = None
+        self.counts[item] = count + 1
+
+    def update(self, items):
+        """Counts all items of the iterable."""
+        for item in items:
+            self.add(item)
+
+    def items(self):
+        """Returns pairs (item, count) of the monitored items."""
+        return self.counts.items()
+
+    def max_error(self) -> int:
+        """Returns the maximal overestimation of a count. It is 0 while the counter is not full, the counts are exact."""
+        if len(self.counts) < self.capacity:
+            return 0
+        return self.min_count
@@ -1,81 +1,173 @@
-from PyQt5.QtWidgets import QApplication, QFileDialog
+import concurrent.futures
 import os
+import re
+
+import export_archive
+import json_codec
+from settings import FILE as SETTINGS_FILE, create_default
+
+DISCOVERY = "Datas_j/cache/discovery.json"  # Manifest of the last discovery: chat folder -> its json parts.
+DISCOVERY_VERSION = 1
 
 
 def folder_path_pyqt() -> str:
     """Returns the path to the selected directory using PyQt5 file manager window."""
-    app = QApplication([])
+    # Qt is imported only when the window is needed, so the analysis can run without it (e.g. on a server).
+    from PyQt5.QtWidgets import QApplication, QFileDialog
+
+    app = QApplication.instance() or QApplication([])  # The viewer already has its QApplication.
     folder_path = QFileDialog.getExistingDirectory(None, "Select Folder")
     return folder_path
 
 
+def subfolders(path) -> list:
+    """Returns the names of the folders in the path."""
+    with os.scandir(path) as entries:
+        return [entry.name for entry in entries if entry.is_dir()]
+
+
 def find_chats(path):
     """Returns a list of addresses where json chatlogs are located."""
-    current_directory = os.listdir(path)
     chat_adresses = []
 
     # Searches for folders with chatlogs and adds them to the list.
-    for folder in current_directory:
+    for folder in subfolders(path):
         if "your_activity" in folder:
             path = path + "/" + folder
-            current_directory = os.listdir(path)
-            for folder in current_directory:
+            for folder in subfolders(path):
                 if "messages" in folder:
                     path = path + "/" + folder
-                    current_directory = os.listdir(path)
-                    for folder in current_directory:
+                    for folder in subfolders(path):
                         # Facebook chatlogs are located in different folders, so we need to search for them in different places.
-                        if "archived" in folder:
-                            path1 = path + "/" + folder
-                            chat_logs = (os.listdir(path1))
-                            for log in chat_logs:
-                                chat_adresses.append(path1 + "/" + log)
-                        if "inbox" in str(folder):
-                            path2 = path + "/" + folder
-                            chat_logs = (os.listdir(path2))
-                            for log in chat_logs:
-                                chat_adresses.append(path2 + "/" + log)
-                        if "e2ee_cutover" in str(folder):
-                            path3 = path + "/" + folder
-                            chat_logs = (os.listdir(path3))
-                            for log in chat_logs:
-                                chat_adresses.append(path3 + "/" + log)
+                        if "archived" in folder or "inbox" in folder or "e2ee_cutover" in folder:
+                            for log in subfolders(path + "/" + folder):
+                                chat_adresses.append(path + "/" + folder + "/" + log)
             break
     if len(chat_adresses) == 0:
         raise FileNotFoundError("No chatlogs found. Run the program again and select the correct folder.")
     return chat_adresses
 
 
-def json_sequator(chat_adresses: list) -> dict:
-    """Returns dictionary with names of people and their chatlogs. Searches for json files in the given list of addresses from find_chats()."""
+def part_number(name) -> tuple:
+    """Returns the key which sorts message_1.json, message_2.json, ..., message_10.json by their numbers."""
+    number = re.search(r"\d+", name)
+    return (int(number.group()) if number else 0), name
+
+
+def scan_chat(folder, cached=None) -> dict:
+    """Returns {"mtime": mtime of the folder, "parts": [[name, size, mtime], ...]} of the json files in the chat folder,
+    sorted by the number of the part. If the folder has the same mtime as in the cached entry, no file was added,
+    removed or renamed, so the cached entry is returned without listing the folder."""
+    mtime = os.stat(folder).st_mtime_ns
+    if cached is not None and cached["mtime"] == mtime:
+        return cached
+
+    parts = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if ".json" in entry.name:
+                stat = entry.stat()
+                parts.append([entry.name, stat.st_size, stat.st_mtime_ns])
+    parts.sort(key=lambda part: part_number(part[0]))
+    return {"mtime": mtime, "parts": parts}
+
+
+def discover(chat_adresses: list, previous=None) -> dict:
+    """Scans the chat folders in a pool of threads, most of the time is spent waiting for the disk or the network.
+    previous = folder -> entry from the previous discovery, the folders which did not change are not listed again.
+    Returns folder -> entry (see scan_chat()) in the order of chat_adresses."""
+    previous = previous or {}
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        entries = executor.map(lambda folder: scan_chat(folder, previous.get(folder)), chat_adresses)
+        return dict(zip(chat_adresses, entries))
+
+
+def load_discovery(manifest=DISCOVERY) -> dict:
+    """Returns the chat folders of the last discovery (folder -> entry), or an empty dictionary."""
+    try:
+        file = open(manifest, "rb")
+        cached = json_codec.load(file)
+        file.close()
+    except (OSError, ValueError):
+        return {}
+    if cached.get("version") != DISCOVERY_VERSION:
+        return {}
+    return cached["folders"]
+
+
+def store_discovery(folders: dict, manifest=DISCOVERY):
+    """Stores the chat folders of the discovery, the file is replaced only when it is complete."""
+    os.makedirs(os.path.dirname(manifest), exist_ok=True)
+    file = open(manifest + ".tmp", "w", encoding="utf-8")
+    file.write(json_codec.dumps({"version": DISCOVERY_VERSION, "folders": folders}))
+    file.close()
+    os.replace(manifest + ".tmp", manifest)
+
+
+def json_sequator(chat_adresses: list, manifest=DISCOVERY) -> dict:
+    """Returns dictionary with names of people and their chatlogs. Searches for json files in the given list of addresses from find_chats().
+    manifest = file with the last discovery, which is reused for the folders which did not change and then updated, None = no manifest."""
+    previous = load_discovery(manifest) if manifest else {}
+    folders = discover(chat_adresses, previous)
+    if manifest:
+        store_discovery(folders, manifest)
+
+    rescanned = sum(1 for folder, entry in folders.items() if previous.get(folder) is not entry)
+    removed = len(previous.keys() - folders.keys())
+    print(f"Chat folders: {len(folders)}, scanned: {rescanned}, unchanged: {len(folders) - rescanned}, removed: {removed}")
+
+    all_adresses = {}
+    for folder, entry in folders.items():
+        if entry["parts"]:  # Folders without json files are skipped.
+            all_adresses[folder.split("/")[-1]] = [folder + "/" + name for name, size, mtime in entry["parts"]]
+    return all_adresses
+
+
+def archive_sequator(archive_paths: list) -> dict:
+    """Returns the same dictionary as json_sequator() for the chatlogs in the .zip archives of the export. The parts
+    of a chatlog from all archives are put together. Only the lists of files of the archives are read, so the discovery
+    manifest is not needed."""
+    chats = {}  # folder of the chatlog -> addresses of its json files ("archive.zip!/member")
+    for archive_path in archive_paths:
+        for folder, member in export_archive.chat_parts(archive_path):
+            chats.setdefault(folder, []).append(archive_path + export_archive.SEPARATOR + member)
+    if len(chats) == 0:
+        raise FileNotFoundError("No chatlogs found in the archives. Run the program again and select the correct folder.")
+    print(f"Archives: {len(archive_paths)}, chat folders: {len(chats)}")
+
     all_adresses = {}
-    for x in range(0, len(chat_adresses)):
-        json_adrss = []
-        for y in os.listdir(chat_adresses[x]):
-            if ".json" in y:
-                messager_name = chat_adresses[x].split("/")[-1]
-                if chat_adresses[x] + "/" + y not in json_adrss:
-                    print(chat_adresses[x] + "/" + y)
-                    json_adrss.append(chat_adresses[x] + "/" + y)
-        all_adresses[messager_name] = json_adrss
+    for folder, addresses in chats.items():
+        addresses.sort(key=lambda address: part_number(address.split("/")[-1]))
+        all_adresses[folder.split("/")[-1]] = addresses
     return all_adresses
 
 
-def json_addresses():
+def find_addresses(adrress, manifest=DISCOVERY, settings_path=SETTINGS_FILE) -> dict:
+    """Returns a dictionary where the key is the name of the person leading the chat and the value is a list of
+    addresses of json chatlogs in the given folder. A .txt file with settings is also created.
+    adrress can also be the downloaded .zip archive, or a folder with the .zip archives of the export."""
+    archive_paths = export_archive.archives(adrress)
+    if archive_paths:
+        json_adrressess = archive_sequator(archive_paths)  # The archives are not extracted.
+    else:
+        chat_adresses = find_chats(adrress)
+        json_adrressess = (json_sequator(chat_adresses, manifest))
+    create_default(settings_path)  # if setting.txt does not exist, it is created.
+
+    return json_adrressess
+
+
+def json_addresses(path=None, manifest=DISCOVERY, settings_path=SETTINGS_FILE):
     """ Main function that returns a dictionary where the key is the name of the person leading the chat and the value
-    is a list of addresses of json chatlogs. A .txt file with settings is also created."""
+    is a list of addresses of json chatlogs. A .txt file with settings is also created.
+    path = folder with the data, if it is None, the folder is selected in PyQt5 file manager window. When the path
+    is given (e.g. by the viewer or on the command line), errors are raised to the caller instead of waiting for Enter.
+    manifest = file with the last discovery of the chat folders (see json_sequator()).
+    settings_path = setting.txt which is created if it does not exist."""
+    if path is not None:
+        return find_addresses(path, manifest, settings_path)
     try:
-        adrress = folder_path_pyqt()
-        chat_adresses = find_chats(adrress)
-        print(chat_adresses)
-        json_adrressess = (json_sequator(chat_adresses))
-        # if setting.txt does not exist, it is created.
-        if not os.path.exists("setting.txt"):
-            setting = open("setting.txt", "w")
-            setting.write("moving_average: 30\ntop_words: 50\ntop_words_minimal_len: 1")
-            setting.close()
-
-        return json_adrressess
+        return find_addresses(folder_path_pyqt(), manifest, settings_path)
     except Exception as e:
         print(e)
         input("Press enter to exit.")
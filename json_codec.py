@@ -0,0 +1,51 @@
+import json
+
+# The json files (the chatlogs from Facebook, the results and the caches) are decoded and encoded by a backend,
+# the fastest installed backend is used:
+#  orjson - parser and serializer written in Rust (pip install orjson), optional,
+#  json   - the json module of the standard library, always available.
+# A backend is a pair of functions loads(bytes or str) -> object and dumps(object) -> str. Other backends can be added
+# with register() and selected with use(). All backends give the same objects, only the speed differs.
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKENDS = {}  # name -> (loads, dumps), the fastest first
+
+
+def register(name, loads, dumps):
+    """Function that adds a backend."""
+    BACKENDS[name] = (loads, dumps)
+
+
+if orjson is not None:
+    # orjson returns bytes, the files are written as text. Keys which are not strings are converted as in json.
+    register("orjson", orjson.loads, lambda obj: orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8"))
+register("json", json.loads, json.dumps)
+
+backend = next(iter(BACKENDS))  # name of the backend which is used
+_loads, _dumps = BACKENDS[backend]
+
+
+def use(name):
+    """Function that selects the backend. Raises KeyError if the backend is not installed."""
+    global backend, _loads, _dumps
+    _loads, _dumps = BACKENDS[name]
+    backend = name
+
+
+def loads(data):
+    """Returns the object of the json document (bytes or str). Raises ValueError if the document is not valid."""
+    return _loads(data)
+
+
+def load(file):
+    """Returns the object of the json file. Files opened in binary mode are decoded faster, they are not converted to str."""
+    return _loads(file.read())
+
+
+def dumps(obj) -> str:
+    """Returns the json document of the object."""
+    return _dumps(obj)
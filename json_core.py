@@ -1,10 +1,60 @@
-import json
-from datetime import datetime, timedelta
+import argparse
+import concurrent.futures
+import functools
+import hashlib
+import multiprocessing
+from array import array
+from datetime import datetime
 import string
 import collections
 import os
-
+import re
+import sys
+
+import day_series
+import export_archive
+import json_codec
+from day_series import EPOCH
+from heavy_hitters import SpaceSaving
 from json_address_handler import json_addresses
+from moving_average import moving_average
+from result_store import GENERAL, MANIFEST, SERIES, ResultStore, write_results
+from settings import FILE as SETTINGS_FILE, Settings
+
+
+
+def repair_text(text: str) -> str:
+    """Function that fixes Facebook encoding of the text (UTF-8 bytes stored as latin-1 characters).
+    Pure ASCII text does not need any repair, so it is returned as it is."""
+    if text.isascii():
+        return text
+    return text.encode('latin-1').decode('utf-8')
+
+
+@functools.lru_cache(maxsize=65536)
+def repair_name(name: str) -> str:
+    """Cached repair_text() for short texts which repeat in every message, e.g. names of senders, actors and reactions.
+    Every name is repaired only once and all messages share the same string object."""
+    return sys.intern(repair_text(name))
+
+
+# Words which contain a link (http, https, www) are removed from the casefolded text before it is split into words.
+LINK = re.compile(r"\S*(?:http|www)\S*")
+# string.punctuation and the most common Unicode punctuation, which string.punctuation does not contain.
+PUNCTUATION = str.maketrans('', '', string.punctuation + "“”„‟‘’‚‛«»‹›…–—―‐·•¡¿")
+
+
+def tokenize(text: str, n: int) -> list:
+    """Function that splits the text (one message or several messages joined by new lines) into words.
+    Links and punctuation are removed from the whole text at once, the words are casefolded.
+        n  = is the number of characters that a word must have to be included in the list."""
+    text = text.casefold()
+    if "http" in text or "www" in text:
+        text = LINK.sub(" ", text)  # The regular expression runs only on texts which contain a link.
+    words = text.translate(PUNCTUATION).split()
+    if n <= 1:
+        return words
+    return [word for word in words if len(word) >= n]
 
 
 class JsonHandler():
@@ -28,43 +78,53 @@ class JsonHandler():
         """Function that fixes diacritics in participant names. Fixes Facebook encoding."""
         repaired_names = []
         for participant in (self.data["participants"]):
-            text = participant["name"]
-            corrected_text = text.encode('latin-1').decode('utf-8')
-            repaired_names.append({"name": corrected_text})
+            repaired_names.append({"name": repair_name(participant["name"])})
         self.data["participants"] = repaired_names
 
     def repair_title(self):
         """Function that fixes diacritics in the chat title."""
-        self.data["title"] = self.data["title"].encode('latin-1').decode('utf-8')
+        self.data["title"] = repair_text(self.data["title"])
 
     def repair_messages(self):
         """Function that fixes diacritics in the content of individual messages. And also fixes the message timestamp."""
 
         for message in self.data["messages"]:
-            # message is a dict
-            # {sender_name : str, content : str, reaction : list[{reaction : str, actor : str}]} These three keys and values will need to be fixed.
+            self.repair_message(message)
+
+    @staticmethod
+    def repair_message(message) -> dict:
+        """Function that fixes diacritics and the timestamp of one message. Returns the repaired message."""
+        # fixes the content of the message
+        if "content" in message:
+            message["content"] = repair_text(message["content"])
+
+        return JsonHandler.repair_message_lazily(message)
 
-            # fixes the sender name of the message
-            if "sender_name" in message:
-                message["sender_name"] = message["sender_name"].encode('latin-1').decode('utf-8')
+    @staticmethod
+    def repair_message_lazily(message) -> dict:
+        """The same as repair_message(), but the content of the message is not repaired. The content is the longest text
+        of the message, so it is repaired with repair_text() only by the accumulator which reads it (WordCounter)."""
+        # message is a dict
+        # {sender_name : str, content : str, reaction : list[{reaction : str, actor : str}]} These three keys and values will need to be fixed.
 
-            # fixes the content of the message
-            if "content" in message:
-                message["content"] = message["content"].encode('latin-1').decode('utf-8')
+        # fixes the sender name of the message
+        if "sender_name" in message:
+            message["sender_name"] = repair_name(message["sender_name"])
 
-            # fixes the reactions to the message
-            if "reactions" in message:
-                reaction_list = []
-                for reaction in (message["reactions"]):
-                    reaction["actor"] = reaction["actor"].encode('latin-1').decode('utf-8')
-                    reaction["reaction"] = reaction["reaction"].encode('latin-1').decode('utf-8')
-                    reaction_list.append(reaction)
-                message["reactions"] = reaction_list
+        # fixes the reactions to the message
+        if "reactions" in message:
+            for reaction in (message["reactions"]):
+                reaction["actor"] = repair_name(reaction["actor"])
+                reaction["reaction"] = repair_name(reaction["reaction"])
 
-            # fixes the message timestamp, so it matches the format "Y-m-d H:M:S"
-            if "timestamp_ms" in message:
-                message["timestamp_ms"] = datetime.fromtimestamp(message["timestamp_ms"] / 1000.0).strftime(
-                    "%Y-%m-%d %H:%M:%S")
+        # adds the day (number of days since 1970-01-01) and the hour of the message in local time.
+        # timestamp_ms stays a number, dates are formatted as text only when the results are stored.
+        if "timestamp_ms" in message:
+            moment = datetime.fromtimestamp(message["timestamp_ms"] / 1000.0)
+            message["day"] = moment.toordinal() - EPOCH
+            message["hour"] = moment.hour
+
+        return message
 
 
 class JsonFile:
@@ -73,14 +133,24 @@ class JsonFile:
 
     def __init__(self, json_address_list):
         self.json_address_list = json_address_list
+        self.fingerprint = []  # [path, size, mtime, content hash] of every part which was read, see read_part()
+
+    def read_part(self, json_filename):
+        """Returns the part of the chatlog. Its fingerprint for ChatCache is recorded from the same bytes, so the part
+        does not have to be read (and decompressed) again when the result is cached. The size and mtime are taken before
+        the part is read, so a part which changes meanwhile is recognized by the next analysis."""
+        size, mtime = export_archive.stat(json_filename)
+        with export_archive.open_part(json_filename) as file:  # A part in an archive is decompressed while it is read.
+            content = file.read()
+        self.fingerprint.append([json_filename, size, mtime, ChatCache.bytes_hash(content)])
+        return json_codec.loads(content)
 
     def load_json(self):
         """If the json chat is very long, Facebook will divide it into several parts. This function is able to load all parts and combine them into one dictionary."""
         dictionary_combined = {}
         dictionary_combined["messages"] = []
         for json_filename in self.json_address_list:
-            file = open(json_filename, "r")
-            file = json.load(file)
+            file = self.read_part(json_filename)  # The file can also be inside an archive.
 
             dictionary_combined["participants"] = file["participants"]
             dictionary_combined["title"] = file["title"]
@@ -88,6 +158,125 @@ class JsonFile:
 
         return dictionary_combined
 
+    def iter_parts(self):
+        """Yields the parts of the chatlog one by one, so only one part is in memory at a time."""
+        for json_filename in self.json_address_list:
+            part = self.read_part(json_filename)
+            yield part
+
+    def stream_json(self):
+        """Streaming version of load_json(). Returns the same dictionary, but "messages" is a generator which loads
+        the parts only when their messages are needed. A part is released as soon as all its messages were read."""
+        parts = self.iter_parts()
+        first_part = next(parts)
+
+        def messages(part):
+            while part is not None:
+                yield from part["messages"]
+                part = next(parts, None)  # The previous part can be released.
+
+        return {"participants": first_part["participants"],
+                "title": first_part["title"],
+                "messages": messages(first_part)}
+
+
+class MessageCounter:
+    """Accumulator for JsonAnalytics.analyse() that counts the number of messages from individual chat participants.
+    The result sorted in descending order is stored in JsonAnalytics.counts."""
+
+    def __init__(self, analytics):
+        self.analytics = analytics
+        self.counts = analytics.counts
+
+    def add(self, message):
+        try:
+            # if the sender name of the message is in counts, its value is increased by 1.
+            self.counts[message["sender_name"]] += 1
+
+        except KeyError:
+            # if sender_name is not in counts, it is added and will have a value of 1. This can happen,
+            # if someone leaves the group, the person will not be in participants, but his messages will be in messages.
+            # it must be handled.
+            # alternatively, it could be handled by adding a person to participants, but that would be unnecessary.
+            self.counts[message["sender_name"]] = 1
+
+    def finish(self):
+        # Sorts the dictionary in descending order by values and stores in self.counts.
+        self.analytics.counts = dict(sorted(self.counts.items(), key=lambda item: item[1], reverse=True))
+
+
+class TimelineBuilder:
+    """Accumulator for JsonAnalytics.analyse() that appends every message to the timeline columns
+    JsonAnalytics.timeline_days, timeline_hours and timeline_senders."""
+
+    def __init__(self, analytics):
+        self.analytics = analytics
+        self.sender_index = {}  # name of the sender -> index in JsonAnalytics.senders
+        for participant in analytics.data["participants"]:
+            self.sender_index.setdefault(participant["name"], len(self.sender_index))
+
+    def add(self, message):
+        try:
+            sender = self.sender_index[message["sender_name"]]
+        except KeyError:
+            # If the sender's name is not in participants (someone who left the group), it gets a new index.
+            sender = self.sender_index[message["sender_name"]] = len(self.sender_index)
+
+        self.analytics.timeline_days.append(message["day"])  # added by JsonHandler.repair_message()
+        self.analytics.timeline_hours.append(message["hour"])
+        self.analytics.timeline_senders.append(sender)
+
+    def finish(self):
+        self.analytics.senders = list(self.sender_index)
+
+
+class WordCounter:
+    """Accumulator for JsonAnalytics.analyse() that counts the words of individual chat participants.
+    The most common words are stored in JsonAnalytics.top_words.
+        n  = is the number of characters that a word must have to be included in the list.
+        length = is the number of words that will be displayed.
+        repair_content = function which repairs the content before it is split into words, used with JsonHandler.repair_message_lazily.
+        capacity = if it is not 0, the words are counted approximately by heavy_hitters.SpaceSaving, which keeps at most
+        capacity words for each participant. The maximal overestimation of the counts is stored in JsonAnalytics.top_words_error."""
+
+    def __init__(self, analytics, n: int, length: int, repair_content=None, capacity=0):
+        self.analytics = analytics
+        self.repair_content = repair_content
+        self.n = n
+        self.length = length
+        if capacity:
+            self.new_counter = functools.partial(SpaceSaving, capacity)
+        else:
+            self.new_counter = collections.Counter
+
+        # The words are counted immediately, so every word is stored only once.
+        self.word_counts = {participant: self.new_counter() for participant in analytics.top_words}
+        self.sum_counts = self.word_counts["*_Sum_*"]
+
+    def add(self, message):
+        if "content" in message:
+            content = message["content"]
+            if self.repair_content is not None:
+                content = self.repair_content(content)
+            words = tokenize(content, self.n)  # Words without punctuation and links, in lowercase.
+
+            if words:
+                try:
+                    self.word_counts[message["sender_name"]].update(words)
+                except KeyError:
+                    # If the sender's name is not in participants, it adds it to the dictionary as a key and the value is a counter of words.
+                    self.word_counts[message["sender_name"]] = self.new_counter()
+                    self.word_counts[message["sender_name"]].update(words)
+                self.sum_counts.update(words)
+
+    def finish(self):
+        # Sorts words by amount of word and write count of word to dictionary, sorted.
+        for participant, word_counts in self.word_counts.items():
+            self.analytics.top_words[participant] = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)[
+                                                    0:self.length]  # [0:length] = number of words that will be displayed.
+            # Exact counts have no error.
+            self.analytics.top_words_error[participant] = word_counts.max_error() if isinstance(word_counts, SpaceSaving) else 0
+
 
 class JsonAnalytics:
     """Class that takes care of chatlog analysis. The argument is a dictionary, which is the result of the JsonFile class and its load_json() method."""
@@ -96,8 +285,8 @@ class JsonAnalytics:
         self.data = prepared_data  # corrected data from JsonFile class
         self.dates_1 = []  # list that will contain the message date in the format: year-month-day
         self.dates_2 = []  # list that will contain the message hour in the format: hour-minute-second
-        self.all_days = []
-        self.day_counts = {}  # dictionary which will contain counts of words
+        self.day_axis = []  # [first day, last day] of the series of days, shared by all participants
+        self.day_counts = {}  # dictionary which will contain the number of messages for each day
         for name in self.data["participants"]:
             self.day_counts[name["name"]] = []
 
@@ -107,7 +296,7 @@ class JsonAnalytics:
         for name in self.data["participants"]:
             self.day_counts_graph[name["name"]] = []
 
-        self.hour_counts = {}  # dictionary which will contain counts of words
+        self.hour_counts = {}  # dictionary which will contain the number of messages for each hour
         for name in self.data["participants"]:
             self.hour_counts[name["name"]] = []
 
@@ -117,8 +306,11 @@ class JsonAnalytics:
         for name in self.data["participants"]:
             self.hour_counts_graph[name["name"]] = []
 
-        self.dates_1_all = []
-        self.dates_2_all = []
+        # Timeline of all messages stored as compact columns, one item per message in the order of self.data["messages"].
+        self.timeline_days = array('i')  # day of the message as the number of days since 1970-01-01
+        self.timeline_hours = array('b')  # hour of the message 0 - 23
+        self.timeline_senders = array('i')  # index of the sender of the message in self.senders
+        self.senders = []  # names of all senders, participants first
 
         self.ma_values = {}
         for name in self.data["participants"]:
@@ -134,6 +326,7 @@ class JsonAnalytics:
             self.top_words[name[
                 "name"]] = []  # The keys will be the names of chat participants and the values will be lists of words,
             # which will be sorted by the number of occurrences. And also the total sum.
+        self.top_words_error = {}  # dictionary, which will contain the maximal overestimation of the counts in top_words
 
         self.stored_data = {}
 
@@ -150,23 +343,24 @@ class JsonAnalytics:
 
     def count_messages(self):
         """Function that counts the number of messages from individual chat participants. The result sorted in descending order is stored in a dictionary."""
+        self.analyse([MessageCounter(self)])
 
-        # Gradually goes through message by message.
-        for message in self.data["messages"]:
-
-            try:
-                # if the sender name of the message is in counts, its value is increased by 1.
-                self.counts[message["sender_name"]] += 1
+    def analyse(self, accumulators, repair=None):
+        """Fused analyzer. Goes through the messages only once and passes every message to all accumulators
+        (MessageCounter, TimelineBuilder, WordCounter or any object with add(message) and finish() methods).
+        self.data["messages"] can be a generator (JsonFile.stream_json()), so only the message which is being
+        processed has to be in memory.
+            repair = function which repairs the message before it is passed to the accumulators, e.g. JsonHandler.repair_message."""
+        adds = [accumulator.add for accumulator in accumulators]
 
-            except KeyError:
-                # if sender_name is not in counts, it is added and will have a value of 1. This can happen,
-                # if someone leaves the group, the person will not be in participants, but his messages will be in messages.
-                # it must be handled.
-                # alternatively, it could be handled by adding a person to participants, but that would be unnecessary.
-                self.counts[message["sender_name"]] = 1
+        for message in self.data["messages"]:
+            if repair is not None:
+                repair(message)
+            for add in adds:
+                add(message)
 
-        # Sorts the dictionary in descending order by values and stores in self.counts.
-        self.counts = dict(sorted(self.counts.items(), key=lambda item: item[1], reverse=True))
+        for accumulator in accumulators:
+            accumulator.finish()
 
     def store_data(self):
         """Function that stores the results of the analysis in a dictionary. self.stored_data will be used as input data for the GeneralData class."""
@@ -176,157 +370,93 @@ class JsonAnalytics:
                                                  self.counts,
                                                  self.hour_counts_graph,
                                                  self.day_counts_graph,
-                                                 self.ma_values,
-                                                 self.top_words]}
+                                                 self.day_axis,
+                                                 self.top_words,
+                                                 self.top_words_error]}
         # {"chatlog name:[
         # [0] = chat_type
         # [1] = participants
         # [2] = total_messages
         # [3] = counts:
         # [4] = hour_counts_graph: [name: [hours, counts]]
-        # [5] = day_counts_graph: [name: [dates, counts]]
-        # [6] = top_words: [name: [word, count]]
+        # [5] = day_counts_graph: [name: [days, counts]], only the days with messages (see day_series.py)
+        # [6] = day_axis: [first day, last day] of the series in [5], moving averages are calculated when they are shown
+        # [7] = top_words: [name: [word, count]]
+        # [8] = top_words_error: [name: maximal overestimation of the counts in top_words, 0 = exact]
         # ]}
 
-    def dates(self):
-        """Function that returns dictionaries with dates, where the key is the participant's name and the value is
-        a list where the first element is a list of dates and the second element is a list of the number of messages."""
-        for message in self.data["messages"]:
-            try:
-
-                self.day_counts[message["sender_name"]].append(
-                    message["timestamp_ms"].split()[0])  # Adds Year-Month-Day to the list.
-                self.hour_counts[message["sender_name"]].append(
-                    int(message["timestamp_ms"].split()[1].split(":")[0]))  # Adds Hour-Minute-Second to the list.
-                self.dates_1_all.insert(0, message["timestamp_ms"].split()[
-                    0])  # Adds Year-Month-Day to the list of all dates.
-                self.dates_2_all.insert(0, int(message["timestamp_ms"].split()[1].split(":")[
-                                                   0]))  # Adds Hour-Minute-Second to the list of all dates.
+    def timeline(self):
+        """Function that fills the columns self.timeline_days, self.timeline_hours and self.timeline_senders with one
+        item per message. The columns are only appended to, so it takes one pass over the messages."""
+        if self.timeline_days:
+            return  # The timeline is already built.
 
-            except KeyError:
-                # If the sender's name is not in participants, it adds it to the dictionary as a key and the value is a list with the date.
-                self.day_counts[message["sender_name"]] = [message["timestamp_ms"].split()[0]]
-                self.hour_counts[message["sender_name"]] = [int(message["timestamp_ms"].split()[1].split(":")[0])]
-                self.dates_1_all.insert(0, message["timestamp_ms"].split()[0])
-                self.dates_2_all.insert(0, int(message["timestamp_ms"].split()[1].split(":")[0]))
+        self.analyse([TimelineBuilder(self)])
 
-        # Sorts the lists with dates and hours for each chat participant chronologically.
-        for participant in self.data["participants"]:
-            participant = participant["name"]
-            self.day_counts[participant] = sorted(self.day_counts[participant])
-
-        self.dates_1_all = sorted(self.dates_1_all)  # Sorts the list of all dates chronologically.
-        start_date = self.data["messages"][-1]["timestamp_ms"].split()[0]  # The first date in the chatlog.
-        end_date = datetime.now().strftime('%Y-%m-%d')  # The last date in the chatlog.
-
-        def date_adder(start: str, end: str):
-            """Function that returns a list of all dates between two dates."""
-            start = datetime.strptime(start, "%Y-%m-%d")
-            end = datetime.strptime(end, "%Y-%m-%d")
-            date_array = (start + timedelta(days=x) for x in range(0, (end - start).days + 1))
-            return [date.strftime("%Y-%m-%d") for date in date_array]
-
-        self.all_days = date_adder(start_date,
-                                   end_date)  # list of all dates between the first and last date in the chatlog.
+    def dates(self):
+        """Function that returns dictionaries with days, where the key is the participant's name and the value is
+        a sparse series [days, counts] with only the days with messages (see day_series.py). All series share
+        the axis self.day_axis from the first day of the chatlog to today.
+        Every message is put into its day and hour bucket in a single pass, so the cost grows linearly with the number of messages."""
+        self.timeline()
+        # The day of the oldest message. The parts and the messages do not have to be ordered, so it is not the last one.
+        start_day = min(self.timeline_days)
+        end_day = day_series.today()  # The last day of the series.
+        self.day_axis = [start_day, end_day]
         all_hours = [_ for _ in range(00, 24)]  # list of all hours... 0 - 23
-        for participant, days in self.day_counts.items():
-            messages_per_day = []
 
-            # Counts the number of messages for each day.
-            for time in self.all_days:
-                messages_per_day.append(days.count(
-                    time))  # For each day, it counts the number of messages on that day and adds to the list.
-            try:
-                # Storing in a dictionary where the key is the participant's name and the value is a list where the first element is a list of dates and the second element is a list of the number of messages on individual days.
-                self.day_counts_graph[participant].append(self.all_days)
-                self.day_counts_graph[participant].append(messages_per_day)
-            except KeyError:
-                # If the participant's name is not in participants, it adds it to the dictionary as a key and the value is a list with dates and the number of messages.
-                self.day_counts_graph[participant] = [self.all_days, messages_per_day]
-
-        messages_per_day = []
-        for time in self.all_days:
-            messages_per_day.append(self.dates_1_all.count(
-                time))  # Counts the number of messages for each day regardless of the chat participant. Will be used for GeneralData.
-
-        self.day_counts_graph["*_Sum_*"] = [self.all_days,
-                                            messages_per_day]  # Stores in a dictionary where the key is *_Sum_* and the value is a list [dates, counts of messages on individual dates].
-        del messages_per_day
+        # Every sender gets a dictionary day -> number of messages and an array with the number of messages for each hour.
+        sender_days = [{} for _ in self.senders]
+        sender_hours = [[0] * 24 for _ in self.senders]
+        sum_days = {}  # Number of messages for each day regardless of the chat participant.
+        sum_hours = [0] * 24  # Number of messages for each hour regardless of the chat participant.
+
+        for day, hour, sender in zip(self.timeline_days, self.timeline_hours, self.timeline_senders):
+            # Messages outside of the axis are not counted.
+            if start_day <= day <= end_day:
+                days = sender_days[sender]
+                days[day] = days.get(day, 0) + 1
+                sum_days[day] = sum_days.get(day, 0) + 1
+            sender_hours[sender][hour] += 1
+            sum_hours[hour] += 1
+
+        for sender, name in enumerate(self.senders):
+            self.day_counts[name] = day_series.sparse(sender_days[sender])
+            self.hour_counts[name] = sender_hours[sender]
+
+        for participant, messages_per_day in self.day_counts.items():
+            # Storing in a dictionary where the key is the participant's name and the value is a list where the first element is a list of days and the second element is a list of the number of messages on individual days.
+            # Participants without messages have an empty series.
+            self.day_counts_graph[participant] = messages_per_day if messages_per_day else [[], []]
+
+        self.day_counts_graph["*_Sum_*"] = day_series.sparse(
+            sum_days)  # Stores in a dictionary where the key is *_Sum_* and the value is a list [days, counts of messages on individual days].
 
         # The same procedure as for dates, but for hours.
-        for participant, hours in self.hour_counts.items():
-
-            hours_per_day = []
-
-            for time in all_hours:
-                hours_per_day.append(hours.count(time))
-
+        for participant, hours_per_day in self.hour_counts.items():
             try:
                 self.hour_counts_graph[participant].append(all_hours)
                 self.hour_counts_graph[participant].append(hours_per_day)
             except KeyError:
                 self.hour_counts_graph[participant] = [all_hours, hours_per_day]
 
-        hours_per_day = []
-        for time in all_hours:
-            hours_per_day.append(self.dates_2_all.count(time))
+        self.hour_counts_graph["*_Sum_*"] = [all_hours, sum_hours]
 
-        self.hour_counts_graph["*_Sum_*"] = [all_hours, hours_per_day]
-        del hours_per_day
-
-    def most_words(self, n: int, length: int):
+    def most_words(self, n: int, length: int, capacity=0):
         """Returns a dictionary where the key is the name of the chat participant and the value is a list of words that are sorted by the number of occurrences.
             n  = is the number of characters that a word must have to be included in the list.
-            length = is the number of words that will be displayed."""
-        translator = str.maketrans('', '', string.punctuation)
-
-        for message in self.data["messages"]:
-            if "content" in message:
-                for content_of_message in message["content"].split():
-                    content_of_message = content_of_message.translate(
-                        translator).lower()  # Removes punctuation and converts to lowercase.
-                    # Filter for words that are longer than n characters and do not contain a link.
-                    try:
-                        if len(content_of_message) >= n and "http" not in content_of_message and "www" not in content_of_message:
-                            self.top_words[message["sender_name"]].append(content_of_message)
-                            self.top_words["*_Sum_*"].append(content_of_message)
-                    except KeyError:
-                        # If the sender's name is not in participants, it adds it to the dictionary as a key and the value is a list with words.
-                        if len(content_of_message) >= n and "http" not in content_of_message and "www" not in content_of_message:
-                            self.top_words[message["sender_name"]] = [content_of_message]
-                            self.top_words["*_Sum_*"].append(content_of_message)
-
-        # Sorts words by amount of word and write count of word to dictionary, sorted.
-        for participant, words in self.top_words.items():
-            word_counts = collections.Counter(words)  # Spočítá počet výskytů slov.
-            self.top_words[participant] = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)[
-                                          0:length]  # [0:length] = number of words that will be displayed.
+            length = is the number of words that will be displayed.
+            capacity = maximal number of counted words for each participant, 0 counts all words exactly (see WordCounter)."""
+        self.analyse([WordCounter(self, n, length, capacity=capacity)])
 
-    def moving_avarage(self, n=30):
+    def moving_avarage(self, n=30, kind="simple"):
         """Function that calculates the moving average of the number of messages for n days. The result is stored in a dictionary
-         where the key is the name of the chat participant and the value is a list of dates and the number of messages."""
-        for name, counts in self.day_counts_graph.items():
-            dates = counts[0]
-            values = counts[1]
-
-            ma_dates_ = []
-            ma_values_ = []
-
-            ma_dates_.extend(dates[0:n - 1])
-            ma_values_.extend([0] * (n - 1))
-            x = 0
-            y = n - 1
-
-            # Calculates the moving average and stores it in a dictionary where the key is the name of the chat participant and the value is a list of dates and the number of messages.
-            while y < len(values):
-                ma_values_.append(sum(values[x:y + 1]) / len(values[x:y + 1]))
-                ma_dates_.append(dates[y])
-
-                # Moving the window by one day.
-                x += 1
-                y += 1
-
-            self.ma_values[name] = [ma_dates_, ma_values_]  # Uloží data do slovníku
+         where the key is the name of the chat participant and the value is a list of dates and the number of messages.
+         kind = is the kind of the window, see moving_average.WINDOWS.
+         The moving averages are not stored, the viewer calculates them from the series of days when they are shown."""
+        all_dates = day_series.dates(*self.day_axis)
+        for name, series in self.day_counts_graph.items():
+            self.ma_values[name] = moving_average(all_dates, day_series.densify(series, *self.day_axis), n, kind)  # Uloží data do slovníku
 
     # My version of most_words function, which is not working as fast as it the one above.
 
@@ -359,164 +489,218 @@ class JsonAnalytics:
     #         words_1.clear()
 
 
-class GeneralData:
-    def __init__(self):
+# Chat types which are summed in the General tab: only conversations of two people, only groups, or all chatlogs.
+CHAT_TYPES = {"2ppl": ("2ppl",), "grp": ("grp",), "all": ("2ppl", "grp")}
 
-        self.file = open("Datas_j/data.json", "r", encoding="utf-8")  # Opens the file with the results of the analysis.
-        self.data = json.load(self.file)  # Loads the file with the results of the analysis.
-        self.me = "Undjsfě2384JWFJDKcn"  # Random string, which will be replaced by the name of the chat participant.
-        self.me = self.identify()  # Calls the identify function, which tries to identify the name of the chat participant.
+
+class GeneralData:
+    def __init__(self, owner=None, data=None, owner_origin="Warning"):
+        """owner = your name, if it is None, empty or not a participant of any chatlog, it is identified from the chatlogs by identify().
+        data = results of the analysis of all chatlogs (list of JsonAnalytics.stored_data), if it is None, they are loaded from Datas_j.
+        owner_origin = where the owner was set (Settings.where()), it starts the message about an owner which is not a participant."""
+
+        if data is None:
+            store = ResultStore()  # Opens the results of the analysis.
+            data = store.load_all(general=False)  # Loads the results of all chatlogs.
+            store.close()
+        self.data = data
+        self.participant_chats = {}  # name of the participant -> indexes of his chatlogs in self.data
+        self.sender_index = {}  # name of the sender -> chat type -> his activity in the chatlogs of this type, see add_chat()
+        for index, log_data in enumerate(self.data):
+            self.add_chat(index, log_data)
+
+        # Your name is identified only once, the setting in setting.txt has priority.
+        if owner and owner not in self.participant_chats:
+            # A typo or a differently written name would leave the General tab empty.
+            print(f"{owner_origin}: owner '{owner}' is not a participant of any chatlog, your name is identified from the chatlogs.")
+            owner = None
+        self.me = owner if owner else self.identify()
         self.sent = 0  # Number of messages you sent.
         self.received = 0  # Number of messages you received.
-
-        self.all_dates = {}
-        self.all_dates["dates"] = []
-        self.all_dates["counts"] = []
-
+        self.all_dates = []
         self.all_hours = {}
-        self.all_hours["hours"] = []
-        self.all_hours["counts"] = []
 
         self.stats = {}
 
-    def identify(self) -> str:
-        """Function wich will try to identify your name"""
-
-        all_names = []
-        all_counts = {}
+    def add_chat(self, index, log_data):
+        """Adds the results of one chatlog to the indexes. For every sender and chat type it sums the number of his messages,
+        the number of all messages in his chatlogs and his activity in hours, and keeps references to his series of days.
+        The General tab can then be computed for any chat types without going through the chatlogs again."""
+        for key, value in log_data.items():
+            for name in value[1]:
+                self.participant_chats.setdefault(name, []).append(index)
+
+            for name, count in value[3].items():
+                activity = self.sender_index.setdefault(name, {}).setdefault(
+                    value[0], {"sent": 0, "chat_messages": 0, "hours": [0] * 24, "starts": [], "series": []})
+                activity["sent"] += count
+                activity["chat_messages"] += value[2]
+                for hour, hour_count in enumerate(value[4][name][1]):
+                    activity["hours"][hour] += hour_count
+                if value[5][name][0]:
+                    # The first day of the chatlog starts the axis of the General tab, the series has only the days with messages.
+                    activity["starts"].append(value[6][0])
+                    activity["series"].append(value[5][name])
 
-        for log_data in self.data:
-            for key, value in log_data.items():
-                for name in value[1]:
-                    all_names.append(name)
-
-        # Counts the number of occurrences of each name.
-        for name in all_names:
-            if name in all_counts:
-                all_counts[name] += 1
-            else:
-                all_counts[name] = 1
+    def identify(self) -> str:
+        """Function wich will try to identify your name. You are the participant of the most chatlogs."""
 
         # key, value with max value
-        return max(all_counts, key=all_counts.get)
+        return max(self.participant_chats, key=lambda name: len(self.participant_chats[name]))
 
-    def collect_data(self, include_groups=False):
+    def collect_data(self, include_groups=False, chat_types=None):
         """Function that collects data from all chatlogs and stores them in a dictionary. If include_groups is False,
-        it will only collect data from chatlogs between two people. If include_groups is True, it will collect data from all chatlogs,
-        but this setting is not currently supported.
+        it will only collect data from chatlogs between two people. If include_groups is True, it will collect data from all chatlogs.
+        chat_types = chat types which will be collected (see CHAT_TYPES), it has priority over include_groups.
         These data will be used for the GeneralData Tab."""
-        for log_data in self.data:
-            for key, value in log_data.items():
-                if include_groups == False:
-                    if value[0] == "2ppl":
-                        self.sent += value[3][self.me]
-
-                        for name, count in value[3].items():
-                            if name != self.me and name != "*_Sum_*":
-                                self.received += count
-
-                        me = self.identify()
-                        self.all_hours["hours"] = (value[4][me][0])  # Adds hours to the list.
-                        self.all_hours["counts"].append(value[4][me][1])  # Adds the number of messages to the list.
-                        self.all_dates["dates"].extend(value[5][me][0])  # Adds dates to the list.
-                        self.all_dates["counts"].extend(value[5][me][1])  # Adds the number of messages to the list.
-
-                else:
-                    for name, count in value[3].items():
-                        if name == self.me:
-                            self.sent += count
-                        if name != "*_Sum_*" and name != self.me:
-                            self.received += count
+        if chat_types is None:
+            chat_types = CHAT_TYPES["all"] if include_groups else CHAT_TYPES["2ppl"]
 
-        # Sums the number of messages for each hour. Will be used for General Data tab.
-        lists = [f for f in self.all_hours["counts"]]
-        result = []
-        for x in range(0, 24):
-            val = 0
-            for y in lists:
-                val += y[x]
-            result.append(val)
-        self.all_hours["counts"] = result
-
-        # Sums the number of messages for each day. Will be used for General Data tab.
-        result_dates = {}
-
-        for x in range(0, len(self.all_dates["dates"])):
-            result_dates[self.all_dates["dates"][x]] = 0
-
-        for x in range(0, len(self.all_dates["dates"])):
-            result_dates[self.all_dates["dates"][x]] += self.all_dates["counts"][x]
-
-        # Sorts the dictionary by date.
-        days = sorted(list(result_dates.keys()))
-
-        # Creates a list of all dates between the first and last date in the chatlog.
-        start_date = days[0]
-        end_date = datetime.now().strftime('%Y-%m-%d')
+        # Your activity in the chatlogs of the selected types, taken from the index of senders.
+        activities = [self.sender_index.get(self.me, {}).get(chat_type) for chat_type in chat_types]
+        activities = [activity for activity in activities if activity is not None]
 
-        def date_adder(start, end):
+        self.sent = sum(activity["sent"] for activity in activities)
+        # Messages of the other participants of your chatlogs.
+        self.received = sum(activity["chat_messages"] - activity["sent"] for activity in activities)
 
-            start = datetime.strptime(start, "%Y-%m-%d")
-            end = datetime.strptime(end, "%Y-%m-%d")
-            date_array = (start + timedelta(days=x) for x in range(0, (end - start).days + 1))
-            return [date.strftime("%Y-%m-%d") for date in date_array]
-
-        days = date_adder(start_date, end_date)
-
-        result_dates_1 = days  # list of all dates between the first and last date in the chatlog.
-        result_dates_2 = [0] * len(days)  # list with counts of messages for each day.
-
-        # Adds the number of messages to the list.
-        for day, count in result_dates.items():
-            if day in result_dates_1:
-                result_dates_2[result_dates_1.index(day)] = count
+        # Sums the number of messages for each hour. Will be used for General Data tab.
+        result = [0] * 24
+        for activity in activities:
+            for x in range(0, 24):
+                result[x] += activity["hours"][x]
+        self.all_hours = {"hours": list(range(0, 24)), "counts": result}
 
-        # Stores the results in a dictionary.
-        self.all_dates = [result_dates_1, result_dates_2]
+        # Sums the number of messages for each day. Will be used for General Data tab.
+        # The axis starts on the first day of your oldest chatlog and ends today, only the days with messages are stored.
+        starts = [first_day for activity in activities for first_day in activity["starts"]]
+        end_day = day_series.today()
+        start_day = min(starts, default=end_day)
+        self.all_dates = day_series.merge([series for activity in activities for series in activity["series"]],
+                                          start_day, end_day)
 
         # Stores the results in a dictionary. These data will be used for the GeneralData Tab.
-        self.stats = {"sent": self.sent, "received": self.received, "hours": self.all_hours, "dates": self.all_dates}
-
-    def moving_avarage(self, n=30):
-
-        """Function that calculates the moving average of the number of messages for n days. The result is stored in a dictionary."""
-
-        dates_1 = self.stats["dates"][0]
-        counts_1 = self.stats["dates"][1]
-
-        dates = dates_1
-        values = counts_1
-        ma_dates_ = []
-        ma_values_ = []
-
-        ma_dates_.extend(dates[0:n - 1])
-        ma_values_.extend([0] * (n - 1))
-        x = 0
-        y = n - 1
-
-        while y < len(values):
-            ma_values_.append(sum(values[x:y + 1]) / len(values[x:y + 1]))
-            ma_dates_.append(dates[y])
-
-            x += 1
-            y += 1
-
-        self.stats["moving_average"] = [ma_dates_, ma_values_]
-
-    def save_data(self):
-        """Function that stores the results of the analysis in a json file."""
-        self.data.append({"*-General-*": self.stats})
-        store_data(self.data)
-
-
-def store_data(data):
-    """Function which stores data to json file"""
-
-    file = open("Datas_j/data.json", "w", encoding="utf-8")
-
-    data = json.dumps(data)
-    file.write(data)
-    file.close()
+        self.stats = {"sent": self.sent, "received": self.received, "hours": self.all_hours, "dates": self.all_dates,
+                      "axis": [start_day, end_day]}
+
+    def collect_subsets(self):
+        """Function that collects the data of conversations of two people (the default General tab) and adds the data
+        of groups and of all chatlogs to self.stats["subsets"]."""
+        subsets = {}
+        for subset in ("grp", "all"):
+            self.collect_data(chat_types=CHAT_TYPES[subset])
+            subsets[subset] = self.stats
+
+        self.collect_data(chat_types=CHAT_TYPES["2ppl"])
+        self.stats["subsets"] = subsets
+
+    def moving_avarage(self, n=30, kind="simple"):
+
+        """Function that calculates the moving average of the number of messages for n days. The result is stored in a dictionary.
+        It is not stored in the results, the viewer calculates it from the series of days when it is shown."""
+
+        self.stats["moving_average"] = moving_average(day_series.dates(*self.stats["axis"]),
+                                                      day_series.densify(self.stats["dates"], *self.stats["axis"]), n, kind)
+
+    def save_data(self, folder="Datas_j"):
+        """Function that stores the results of the analysis in the folder (Datas_j by default)."""
+        self.data.append({GENERAL: self.stats})
+        store_data(self.data, folder)
+
+
+class ChatCache:
+    """Class that keeps the results of the analysis of individual chatlogs between runs. A result is stored in its own file
+    together with the fingerprint (path, size, mtime, content hash) of every message_N.json part and the settings,
+    so only new or changed chatlogs have to be analyzed again."""
+
+    # Increase when the format of the results changes or when the analysis gives different results (e.g. tokenize()
+    # changed the top words), old results will be analyzed again.
+    version = 5
+
+    def __init__(self, settings, folder="Datas_j/cache"):
+        self.settings = list(settings)  # settings which change the results of the analysis
+        self.folder = folder
+        os.makedirs(self.folder, exist_ok=True)
+
+    def path(self, log_name) -> str:
+        """Returns the address of the file with the cached result of the chatlog."""
+        return os.path.join(self.folder, log_name + ".json")
+
+    @staticmethod
+    def bytes_hash(content) -> str:
+        """Returns the hash of the content of a file which was already read, the same as content_hash() of the file."""
+        return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    @staticmethod
+    def content_hash(json_filename) -> str:
+        """Returns the hash of the content of the file."""
+        digest = hashlib.blake2b(digest_size=16)
+        with export_archive.open_part(json_filename) as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def fingerprint(self, addr_list) -> list:
+        """Returns [path, size, mtime, content hash] of every part of the chatlog. A part inside an archive has the mtime
+        of the archive (see export_archive.stat())."""
+        parts = []
+        for json_filename in addr_list:
+            size, mtime = export_archive.stat(json_filename)
+            parts.append([json_filename, size, mtime, self.content_hash(json_filename)])
+        return parts
+
+    def load(self, log_name, addr_list):
+        """Returns the cached result of the chatlog, or None if the chatlog is new or changed.
+        The content is hashed only if the path, size or mtime of some part does not match."""
+        try:
+            file = open(self.path(log_name), "rb")
+            cached = json_codec.load(file)
+            file.close()
+        except (OSError, ValueError):
+            return None
+
+        if cached.get("version") != self.version or cached.get("settings") != self.settings:
+            return None
+        if len(cached["fingerprint"]) != len(addr_list):
+            return None
+
+        for json_filename, (path, size, mtime, content_hash) in zip(addr_list, cached["fingerprint"]):
+            current_size, current_mtime = export_archive.stat(json_filename)
+            if json_filename == path and current_size == size and current_mtime == mtime:
+                continue
+            # The file was moved or touched (e.g. a new export), it is the same if its content is the same.
+            if current_size != size or self.content_hash(json_filename) != content_hash:
+                return None
+
+        return cached["result"]
+
+    def store(self, log_name, addr_list, stored_data, fingerprint=None):
+        """Stores the result of the analysis of the chatlog.
+        fingerprint = fingerprint recorded by JsonFile while the parts were analyzed, if it is None (or incomplete),
+                      the parts are read and hashed now."""
+        if fingerprint is None or [part[0] for part in fingerprint] != list(addr_list):
+            fingerprint = self.fingerprint(addr_list)
+        cached = {"version": self.version,
+                  "settings": self.settings,
+                  "fingerprint": fingerprint,
+                  "result": stored_data}
+        file = open(self.path(log_name), "w", encoding="utf-8")
+        file.write(json_codec.dumps(cached))
+        file.close()
+
+
+def extend_days(stored_data):
+    """The series of days end on the day of the analysis. Function that extends the axis of the series of a cached result
+    until today, the days without messages are not stored, so the series themselves do not change."""
+    for title, value in stored_data.items():
+        value[6][1] = max(value[6][1], day_series.today())
+    return stored_data
+
+
+def store_data(data, folder="Datas_j"):
+    """Function which stores data to the folder (Datas_j by default). The results are stored in the columnar format
+    of result_store.py (manifest.json and series.bin)."""
+    write_results(data, folder)
 
 
 def make_dir(name):
@@ -533,22 +717,24 @@ def make_dir(name):
 
     # Check if the directory already exists
     if not os.path.exists(new_directory_path):
-        # Create the directory
-        os.mkdir(new_directory_path)
+        # Create the directory, together with its parent folders
+        os.makedirs(new_directory_path)
         print(f"Directory '{directory_name}' created successfully.")
     else:
         print(f"Directory '{directory_name}' already exists.")
 
 
-def delete_files():
-    """Function that deletes all files in the folder."""
-    folder_path = 'Datas_j'
+# Files of the results which are not written any more: the results of older versions and the unfinished files
+# of an interrupted write. manifest.json and series.bin are not deleted, write_results() replaces them.
+OLD_RESULT_FILES = ("data.json", MANIFEST + ".tmp", SERIES + ".tmp")
 
-    # Get the list of files in the folder
-    files = os.listdir(folder_path)
 
-    # Iterate through the files and delete each one
-    for file in files:
+def delete_files(folder_path="Datas_j"):
+    """Function that deletes the old files of the results in the folder. Other files in the folder (the output folder
+    can be any folder) and the subfolders (the cache) are kept."""
+
+    # Iterate through the old files of the results and delete each one
+    for file in OLD_RESULT_FILES:
         file_path = os.path.join(folder_path, file)
         try:
             if os.path.isfile(file_path):
@@ -558,60 +744,144 @@ def delete_files():
             print(f"Error deleting {file_path}: {e}")
 
 
-def main():
-    """Main function that takes care of the entire analysis. It returns the results of the analysis."""
+def analyse_chat(addr_list, top_words, minimal_len, top_words_capacity=0) -> tuple:
+    """Function that loads, repairs and analyzes one chatlog. Returns the results of the analysis (JsonAnalytics.stored_data)
+    and the fingerprint of its parts for ChatCache (JsonFile.fingerprint), the parts are hashed while they are read.
+    It is a module level function, so it can be run in a worker process."""
+    a = JsonFile(addr_list)  # Creates an instance of the JsonFile class.
+    json_dict = a.stream_json()  # Opens the json files, the messages are loaded part by part while they are analyzed.
+
+    b = JsonHandler(json_dict)  # Creates an instance of the JsonHandler class.
+    b.repair_names()  # Repairs names in the dictionary.
+    b.repair_title()  # Repairs title in the dictionary.
+
+    c = JsonAnalytics(b.data)  # Creates an instance of the JsonAnalytics class.
+    # Repairs the messages, counts them, builds their timeline and counts the most common words in one pass.
+    c.analyse([MessageCounter(c), TimelineBuilder(c), WordCounter(c, minimal_len, top_words, repair_content=repair_text,
+                                                                      capacity=top_words_capacity)],
+              repair=JsonHandler.repair_message_lazily)
+    c.dates()  # Analyzes the dates of messages.
+    c.store_data()  # Stores the results of the analysis in a dictionary.
+    return c.stored_data, a.fingerprint
+
+
+class AnalysisCancelled(Exception):
+    """Exception raised by main() when the analysis is cancelled."""
+
+
+def main(workers=1, path=None, progress=None, cancel=None, output="Datas_j", settings_path=SETTINGS_FILE):
+    """Main function that takes care of the entire analysis. It returns the results of the analysis.
+    workers = is the number of processes which analyze the chatlogs in parallel, 1 analyzes them one by one.
+              None takes the number from the settings (workers in setting.txt).
+    path = folder with the data from Facebook, if it is None, the folder is selected in a window.
+    progress = function which is called after every chatlog with (number of finished chatlogs, number of all chatlogs,
+               results of the chatlog), e.g. to show the progress in the viewer.
+    cancel = threading.Event, when it is set, the analysis stops after the current chatlog and raises AnalysisCancelled.
+             The results of the previous analysis are not deleted, the finished chatlogs stay in the cache.
+    output = folder where the results are stored, its subfolder cache keeps the results of the chatlogs between runs.
+    settings_path = setting.txt with the settings of the analysis, it is created if it does not exist."""
 
     json_data = []
     make_dir(
-        "Datas_j")  # Creates a folder where the results of the analysis will be stored if it does not exist, otherwise it does nothing.
-    delete_files()  # Deletes all files in the folder.
-    json_dictionary = json_addresses()  # Returns a dictionary where the key is the name of the chatlog and the
-    # value is a list of addresses of json chatlogs.
-
-    # Reads the settings from the file.
-    setting = open("setting.txt", "r")
-    setting_data = setting.read().splitlines()
-    moving_avarage_window = int(setting_data[0].split(":")[1])
-    top_words = int(setting_data[1].split(":")[1])
-    minimal_len = int(setting_data[2].split(":")[1])
-    setting.close()
-
-    # For each chatlog, it floads the json file, repairs it, analyzes it and stores the results in a list.
-    for log_name, addr_list in json_dictionary.items():
-        a = JsonFile(addr_list)  # Creates an instance of the JsonFile class.
-        json_dict = a.load_json()  # Loads the json file and combines it into one dictionary.
-
-        b = JsonHandler(json_dict)  # Creates an instance of the JsonHandler class.
-        b.repair_messages()  # Repairs messages in the dictionary.
-        b.repair_names()  # Repairs names in the dictionary.
-        b.repair_title()  # Repairs title in the dictionary.
-
-        c = JsonAnalytics(b.data)  # Creates an instance of the JsonAnalytics class.
-        c.count_messages()  # Counts the number of messages from individual chat participants.
-        c.dates()  # Analyzes the dates of messages.
-        c.most_words(minimal_len, top_words)  # Analyzes the most common words in the chatlog.
-        c.moving_avarage(moving_avarage_window)  # Calculates the moving average of the number of messages for n days.
-        c.store_data()  # Stores the results of the analysis in a dictionary.
-        json_data.append(c.stored_data)  # Adds the results of the analysis to the list.
-        # This list will contain the results of the analysis of all chatlogs.
-
-        print(c.data["title"])  # Prints the name of the chatlog which was analyzed.
-
-    store_data(json_data)  # Stores the results of the analysis in a json file.
-
-    d = GeneralData()  # Creates an instance of the GeneralData class.
-    d.identify()  # Tries to identify your name.
-    d.collect_data()  # Analysis of data from all chatlogs.
-    d.moving_avarage(moving_avarage_window)  # Calculates the moving average of the number of messages for n days.
-    d.save_data()  # Stores the results of the analysis in a json file.
+        output)  # Creates a folder where the results of the analysis will be stored if it does not exist, otherwise it does nothing.
+    cache_folder = os.path.join(output, "cache")
+    executor = None
+    futures = []
+    try:
+        # Returns a dictionary where the key is the name of the chatlog and the value is a list of addresses of json chatlogs.
+        json_dictionary = json_addresses(path, os.path.join(cache_folder, "discovery.json"), settings_path)
+
+        # Reads and validates the settings from the file.
+        settings = Settings.load(settings_path)
+        if workers is None:
+            workers = settings.workers
+        top_words = settings.top_words
+        minimal_len = settings.top_words_minimal_len
+        top_words_capacity = settings.top_words_capacity
+        owner = settings.owner  # Empty = your name is identified automatically.
+
+        # Results of the chatlogs which did not change since the last analysis are taken from the cache.
+        # A different moving average does not need a new analysis, it is calculated from the numbers of messages when it is shown.
+        cache = ChatCache(settings.analysis_key(), cache_folder)
+        cached_results = {}
+        for log_name, addr_list in json_dictionary.items():
+            stored_data = cache.load(log_name, addr_list)
+            if stored_data is not None:
+                cached_results[log_name] = extend_days(stored_data)
+        changed = [log_name for log_name in json_dictionary if log_name not in cached_results]
+
+        # For each new or changed chatlog, it loads the json file, repairs it, analyzes it and stores the results in a list.
+        analyse = functools.partial(analyse_chat, top_words=top_words, minimal_len=minimal_len,
+                                    top_words_capacity=top_words_capacity)
+        if workers > 1 and len(changed) > 1:
+            # The chatlogs are independent, so they are analyzed in a pool of processes.
+            # The results are taken in the same order as the chatlogs, so the output is the same as when run one by one.
+            # The workers are started with spawn, not fork: the viewer runs the analysis in a QThread, and forking
+            # a process with running threads (Qt) can deadlock. Spawn is already the default on Windows and macOS.
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                              mp_context=multiprocessing.get_context("spawn"))
+            futures = [executor.submit(analyse, json_dictionary[log_name]) for log_name in changed]
+            results = (future.result() for future in futures)
+        else:
+            results = map(analyse, [json_dictionary[log_name] for log_name in changed])
+
+        for log_name, addr_list in json_dictionary.items():
+            if cancel is not None and cancel.is_set():
+                raise AnalysisCancelled("The analysis was cancelled.")
+            if log_name in cached_results:
+                stored_data = cached_results[log_name]
+            else:
+                stored_data, fingerprint = next(results)
+                cache.store(log_name, addr_list, stored_data, fingerprint)
+            json_data.append(stored_data)  # Adds the results of the analysis to the list.
+            # This list will contain the results of the analysis of all chatlogs.
+
+            print(next(iter(stored_data)))  # Prints the name of the chatlog which was analyzed.
+            if progress is not None:
+                progress(len(json_data), len(json_dictionary), stored_data)
+    finally:
+        if executor is not None:
+            # The chatlogs which were not started yet are not analyzed when the analysis was cancelled or failed.
+            # (shutdown(cancel_futures=True) needs Python 3.9.)
+            for future in futures:
+                future.cancel()
+            executor.shutdown()
+        # The archives of the export are closed, so they are not locked while the viewer is open.
+        export_archive.close_archives()
+
+    # Creates an instance of the GeneralData class from the results in memory, it also identifies your name.
+    # An owner which is not a participant of any chatlog is reported with its line in the settings.
+    d = GeneralData(owner, json_data, settings.where("owner"))
+    d.collect_subsets()  # Analysis of data from conversations, groups and all chatlogs.
+    delete_files(output)  # Deletes the old files of the results, the results of the previous analysis are replaced only now.
+    d.save_data(output)  # Stores the results of the analysis in a json file.
     return d.data
 
 
 # The main function is called.
 if __name__ == "__main__":
-    try:
-        main()
-    except Exception as e:
-        print(e)
-        input("Press enter to exit.")
-        exit()
+    parser = argparse.ArgumentParser(description="Analysis of Facebook Messenger chatlogs. Without --export, the folder "
+                                                 "with the data from Facebook is selected in a window.")
+    parser.add_argument("--export", default=None,
+                        help="folder with the data from Facebook, the analysis runs without any window (e.g. on a server)")
+    parser.add_argument("--output", default="Datas_j",
+                        help="folder where the results are stored (default: Datas_j)")
+    parser.add_argument("--settings", default=SETTINGS_FILE,
+                        help=f"file with the settings, it is created if it does not exist (default: {SETTINGS_FILE})")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of processes which analyze the chatlogs in parallel (default: workers in the settings)")
+    args = parser.parse_args()
+    if args.export is not None:
+        # Batch mode: errors are printed and the exit code is 1, nobody is waiting for Enter.
+        try:
+            main(args.workers, args.export, output=args.output, settings_path=args.settings)
+        except Exception as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+    else:
+        try:
+            main(args.workers, output=args.output, settings_path=args.settings)
+        except Exception as e:
+            print(e)
+            input("Press enter to exit.")
+            exit()
@@ -0,0 +1,85 @@
+from datetime import date
+
+# Functions that smooth the series of the number of messages per day. Every function takes a list of dates
+# ("Year-Month-Day") and a list of the number of messages on these dates and returns a list [dates, values].
+# Each step costs constant time, the sum of the window is updated instead of being recomputed.
+
+
+def simple(dates: list, values: list, n: int) -> list:
+    """Trailing moving average of n days. The first n - 1 values are 0, because there are not enough days before them."""
+    ma_dates_ = dates[0:n - 1]
+    ma_values_ = [0] * (n - 1)
+
+    window_sum = sum(values[0:n - 1])
+    for y in range(n - 1, len(values)):
+        window_sum += values[y]  # The newest day enters the window.
+        ma_values_.append(window_sum / n)
+        ma_dates_.append(dates[y])
+        window_sum -= values[y - n + 1]  # The oldest day leaves the window.
+
+    return [ma_dates_, ma_values_]
+
+
+def exponential(dates: list, values: list, n: int) -> list:
+    """Exponential moving average, the weight of a day is 2 / (n + 1) and older days fade away gradually."""
+    alpha = 2 / (n + 1)
+    ma_values_ = []
+    average = values[0] if values else 0
+    for value in values:
+        average += alpha * (value - average)
+        ma_values_.append(average)
+
+    return [list(dates), ma_values_]
+
+
+def centered(dates: list, values: list, n: int) -> list:
+    """Moving average of n days centered on the day. At the beginning and at the end of the series
+    the window is shortened to the days that exist."""
+    prefix = [0]  # prefix[i] = sum of values[0:i]
+    for value in values:
+        prefix.append(prefix[-1] + value)
+
+    before = (n - 1) // 2
+    after = n - 1 - before
+    ma_values_ = []
+    for i in range(len(values)):
+        x = max(0, i - before)
+        y = min(len(values), i + after + 1)
+        ma_values_.append((prefix[y] - prefix[x]) / (y - x))
+
+    return [list(dates), ma_values_]
+
+
+def resample(dates: list, values: list, period: str = "week") -> list:
+    """Sums the number of messages for each week (starting on Monday) or each month. The period is labeled by its first date."""
+    period_dates = []
+    period_values = []
+    for day, value in zip(dates, values):
+        if period == "week":
+            day_ = date.fromisoformat(day)
+            label = date.fromordinal(day_.toordinal() - day_.weekday()).isoformat()
+        elif period == "month":
+            label = day[0:7] + "-01"
+        else:
+            raise ValueError(f"Unknown period: {period}")
+
+        if period_dates and period_dates[-1] == label:
+            period_values[-1] += value
+        else:
+            period_dates.append(label)
+            period_values.append(value)
+
+    return [period_dates, period_values]
+
+
+# Kinds of windows which can be used by moving_average().
+WINDOWS = {"simple": simple, "exponential": exponential, "centered": centered}
+
+
+def moving_average(dates: list, values: list, n: int = 30, kind: str = "simple") -> list:
+    """Returns [dates, values] smoothed by the window of the given kind and size n."""
+    try:
+        window = WINDOWS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown kind of moving average: {kind}")
+    return window(dates, values, n)
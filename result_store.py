@@ -0,0 +1,191 @@
+import mmap
+import os
+import sys
+from array import array
+
+import json_codec
+
+# Results of the analysis are stored in two files in the Datas_j folder:
+#  manifest.json - small json file with the metadata of every chatlog (title, type, participants, counts, top words,
+#                  axis of its series of days) and with the position of its series in series.bin,
+#  series.bin    - int32 little-endian numbers: the numbers of messages for every hour of every series, and the sparse
+#                  series of days (see day_series.py), the days with messages followed by their numbers of messages.
+# Days without messages and moving averages are not stored, the viewer creates them for the shown range.
+# series.bin is memory-mapped, so only the chatlog which is read is loaded from the disk.
+
+MANIFEST = "manifest.json"
+SERIES = "series.bin"
+GENERAL = "*-General-*"  # Key of the general data in the results of the analysis.
+VERSION = 2
+
+
+class OutdatedResults(FileNotFoundError):
+    """Exception raised when the results were stored in an older format, they have to be analysed again."""
+
+
+class ResultWriter:
+    """Class that converts the results of the analysis (list of JsonAnalytics.stored_data and the general data)
+    to the columnar format and writes them to the folder."""
+
+    def __init__(self):
+        self.values = array('i')  # content of series.bin
+
+    def put(self, numbers) -> int:
+        """Appends the numbers to series.bin and returns their position."""
+        offset = len(self.values)
+        self.values.extend(numbers)
+        return offset
+
+    def put_days(self, days, counts) -> dict:
+        """Appends the sparse series of days (the days and then their numbers of messages) and returns its record for the manifest."""
+        offset = self.put(days)
+        self.put(counts)
+        return {"offset": offset, "length": len(days)}
+
+    def put_hours(self, counts) -> int:
+        """Appends the numbers of messages for 24 hours, participants without messages have none."""
+        return self.put(list(counts) + [0] * (24 - len(counts)))
+
+    def chat(self, title, value) -> dict:
+        """Returns the manifest record of one chatlog, its series are appended to series.bin."""
+        series = {}
+        for name, (days, counts) in value[5].items():
+            series[name] = {"days": self.put_days(days, counts)}
+        for name, (hours, counts) in value[4].items():
+            series.setdefault(name, {})["hours"] = self.put_hours(counts)
+
+        return {"title": title,
+                "type": value[0],
+                "participants": value[1],
+                "total": value[2],
+                "counts": value[3],
+                "axis": value[6],
+                "series": series,
+                "top_words": value[7],
+                "top_words_error": value[8]}
+
+    def general(self, stats) -> dict:
+        """Returns the manifest record of the general data, its series are appended to series.bin."""
+        record = {"sent": stats["sent"],
+                  "received": stats["received"],
+                  "hours": self.put_hours(stats["hours"]["counts"]),
+                  "axis": stats["axis"],
+                  "days": self.put_days(stats["dates"][0], stats["dates"][1])}
+        if "subsets" in stats:
+            record["subsets"] = {subset: self.general(subset_stats) for subset, subset_stats in stats["subsets"].items()}
+        return record
+
+    def write(self, data, folder="Datas_j"):
+        """Writes the results to the folder. The files are replaced only when they are complete."""
+        manifest = {"version": VERSION, "chats": [], "general": None}
+        for log_data in data:
+            for title, value in log_data.items():
+                if title == GENERAL:
+                    manifest["general"] = self.general(value)
+                else:
+                    manifest["chats"].append(self.chat(title, value))
+
+        values = self.values
+        if sys.byteorder == "big":
+            values = array('i', values)
+            values.byteswap()
+        file = open(os.path.join(folder, SERIES + ".tmp"), "wb")
+        values.tofile(file)
+        file.close()
+        file = open(os.path.join(folder, MANIFEST + ".tmp"), "w", encoding="utf-8")
+        file.write(json_codec.dumps(manifest))
+        file.close()
+        os.replace(os.path.join(folder, SERIES + ".tmp"), os.path.join(folder, SERIES))
+        os.replace(os.path.join(folder, MANIFEST + ".tmp"), os.path.join(folder, MANIFEST))
+
+
+def write_results(data, folder="Datas_j"):
+    """Function that stores the results of the analysis in the columnar format."""
+    ResultWriter().write(data, folder)
+
+
+class ResultStore:
+    """Class that reads the results of the analysis written by write_results(). Raises FileNotFoundError
+    if there are no results (OutdatedResults if they are in an older format).
+    The chatlogs are read one by one, only the manifest is loaded at once."""
+
+    def __init__(self, folder="Datas_j"):
+        file = open(os.path.join(folder, MANIFEST), "rb")
+        self.manifest = json_codec.load(file)
+        file.close()
+        if self.manifest.get("version") != VERSION:
+            raise OutdatedResults("The results were stored by an older version, they have to be analysed again.")
+        self.chats = self.manifest["chats"]
+
+        self.file = open(os.path.join(folder, SERIES), "rb")
+        self.mmap = None
+        if os.fstat(self.file.fileno()).st_size == 0:
+            self.values = array('i')  # mmap can not map an empty file
+        elif sys.byteorder == "big":
+            self.values = array('i', self.file.read())
+            self.values.byteswap()
+        else:
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.values = memoryview(self.mmap).cast('i')
+
+    def close(self):
+        """Releases series.bin, so it can be replaced by a new analysis."""
+        if isinstance(self.values, memoryview):
+            self.values.release()
+        if self.mmap is not None:
+            self.mmap.close()
+        self.file.close()
+
+    def numbers(self, offset, length) -> list:
+        """Returns the numbers from series.bin."""
+        return self.values[offset:offset + length].tolist()
+
+    def days(self, record) -> list:
+        """Returns the sparse series of days [days, counts] of the record."""
+        return [self.numbers(record["offset"], record["length"]),
+                self.numbers(record["offset"] + record["length"], record["length"])]
+
+    def chat(self, index) -> dict:
+        """Returns the results of the chatlog with the index in self.chats, in the format of JsonAnalytics.stored_data."""
+        record = self.chats[index]
+        all_hours = list(range(0, 24))
+        hour_counts_graph = {}
+        day_counts_graph = {}
+        for name, series in record["series"].items():
+            if "hours" in series:
+                hour_counts_graph[name] = [all_hours, self.numbers(series["hours"], 24)]
+            if "days" in series:
+                day_counts_graph[name] = self.days(series["days"])
+
+        return {record["title"]: [record["type"],
+                                  record["participants"],
+                                  record["total"],
+                                  record["counts"],
+                                  hour_counts_graph,
+                                  day_counts_graph,
+                                  list(record["axis"]),
+                                  record["top_words"],
+                                  record["top_words_error"]]}
+
+    def general(self, record=None) -> dict:
+        """Returns the general data in the format of GeneralData.stats, or None if they were not stored."""
+        if record is None:
+            record = self.manifest["general"]
+            if record is None:
+                return None
+
+        stats = {"sent": record["sent"],
+                 "received": record["received"],
+                 "hours": {"hours": list(range(0, 24)), "counts": self.numbers(record["hours"], 24)},
+                 "dates": self.days(record["days"]),
+                 "axis": list(record["axis"])}
+        if "subsets" in record:
+            stats["subsets"] = {subset: self.general(subset_record) for subset, subset_record in record["subsets"].items()}
+        return stats
+
+    def load_all(self, general=True) -> list:
+        """Returns the results of all chatlogs (and the general data) as a list, the same way data.json was stored."""
+        data = [self.chat(index) for index in range(len(self.chats))]
+        if general and self.manifest["general"] is not None:
+            data.append({GENERAL: self.general()})
+        return data
@@ -0,0 +1,116 @@
+import os
+
+# Settings of the analysis and of the viewer are stored in setting.txt, one "name: value" per line.
+# The first three lines were read by their position in older versions, so they are still accepted with any name.
+# The other settings are optional, a missing setting has its default value.
+
+FILE = "setting.txt"
+
+# name -> (type, default value, minimal value)
+FIELDS = {"moving_average": (int, 30, 1),
+          "top_words": (int, 50, 0),
+          "top_words_minimal_len": (int, 1, 1),
+          "top_words_capacity": (int, 0, 0),
+          "owner": (str, "", None),
+          "workers": (int, 1, 1),
+          "chat_cache_size": (int, 32, 1)}
+POSITIONAL = ("moving_average", "top_words", "top_words_minimal_len")
+
+# Content of a new setting.txt
+DEFAULT_TEXT = "moving_average: 30\ntop_words: 50\ntop_words_minimal_len: 1\ntop_words_capacity: 0\nowner: "
+
+
+class SettingsError(ValueError):
+    """Exception raised when setting.txt contains an invalid value."""
+
+
+class Settings:
+    """Typed settings from setting.txt. The file is read and validated once by Settings.load(),
+    reload() reads it again only when it changed."""
+
+    moving_average: int  # length of the window of the moving average in days
+    top_words: int  # number of top words of every participant
+    top_words_minimal_len: int  # minimal length of a top word
+    top_words_capacity: int  # 0 = the words are counted exactly, otherwise the capacity of SpaceSaving
+    owner: str  # your name, empty = identified automatically
+    workers: int  # number of processes of an analysis started from the viewer
+    chat_cache_size: int  # number of chatlogs the viewer keeps in memory
+
+    def __init__(self, path=FILE, **values):
+        self.path = path
+        self.stamp = None  # (mtime, size) of the file when it was read, None if it did not exist
+        self.lines = {}  # name -> number of the line of the setting in the file
+        for name, (type_, default, minimum) in FIELDS.items():
+            setattr(self, name, values.get(name, default))
+
+    @classmethod
+    def load(cls, path=FILE):
+        """Reads and validates the settings. Without the file, all settings have their default values.
+        Raises SettingsError if a value is not valid."""
+        settings = cls(path)
+        try:
+            file = open(path, "r", encoding="utf-8-sig")  # The file is UTF-8 on every system, Notepad may add a BOM.
+            stamp = os.fstat(file.fileno())
+            lines = file.read().splitlines()
+            file.close()
+        except FileNotFoundError:
+            return settings
+        settings.stamp = (stamp.st_mtime_ns, stamp.st_size)
+
+        for number, line in enumerate(lines):
+            if ":" not in line:
+                continue
+            name, value = (part.strip() for part in line.split(":", 1))
+            if name not in FIELDS:
+                if number >= len(POSITIONAL):
+                    continue  # Unknown settings are ignored.
+                name = POSITIONAL[number]
+            setattr(settings, name, settings.parse(name, value, number + 1))
+            settings.lines[name] = number + 1
+        return settings
+
+    def parse(self, name, value, line_number):
+        """Returns the value of the setting converted to its type."""
+        type_, default, minimum = FIELDS[name]
+        if type_ is str:
+            return value
+        if value == "":
+            return default
+        try:
+            value = type_(value)
+        except ValueError:
+            raise SettingsError(f"{self.path}, line {line_number}: {name} must be a number, not '{value}'.")
+        if minimum is not None and value < minimum:
+            raise SettingsError(f"{self.path}, line {line_number}: {name} must be at least {minimum}, not {value}.")
+        return value
+
+    def current_stamp(self):
+        """Returns (mtime, size) of the file now, or None if it does not exist."""
+        try:
+            stamp = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stamp.st_mtime_ns, stamp.st_size
+
+    def reload(self):
+        """Returns the new settings if the file changed since it was read, otherwise None."""
+        if self.current_stamp() == self.stamp:
+            return None
+        return Settings.load(self.path)
+
+    def where(self, name) -> str:
+        """Returns where the setting is written ("setting.txt, line 5"), for the messages about its value."""
+        return f"{self.path}, line {self.lines[name]}" if name in self.lines else self.path
+
+    def analysis_key(self) -> list:
+        """Returns the settings which change the results of the analysis of a chatlog. The moving average is not
+        among them, it is calculated from the numbers of messages whenever they are read."""
+        return [self.top_words, self.top_words_minimal_len, self.top_words_capacity]
+
+
+def create_default(path=FILE):
+    """Function that creates setting.txt with the default settings if it does not exist."""
+    if not os.path.exists(path):
+        file = open(path, "w", encoding="utf-8")
+        file.write(DEFAULT_TEXT)
+        file.close()